@@ -10,16 +10,31 @@ Features:
 """
 
 # External imports
+import sys
+import time
+
 import streamlit as st
-import requests
-import urllib.parse
-import sqlite3
-# To hide API key
-from dotenv import load_dotenv
-import os
-# To create visual representations
-import matplotlib.pyplot as plt
-import numpy as np
+# Pooled database layer
+from db import (
+    GAME_STATUSES, get_pool, initializeDB, get_category_counts, get_category_page, get_reviews,
+    get_game_categories, move_game,
+    add_notplayed_many, set_statuses, remove_game, resolve_appids,
+    get_appids_with_metadata,
+)
+# Steam login and background library syncs
+from steam import (
+    authenticate_with_steam, verify_steam_login, latency_histograms, library_snapshot,
+    refresh_status, request_refresh, watch_library, unwatch_library, refresh_metrics,
+    steam_offline, breaker_states,
+)
+# Logins persisted across page loads
+from sessions import create_session, restore_session, end_session
+# Ratings are saved in the background
+from review_writer import queue_review, discard_review, pending_reviews, review_writer_metrics
+# Real genres from the Steam store
+from store_metadata import fetch_missing_metadata_in_background
+# Per-appid genre classification
+from genres import classify_library
 
 def sanitize_key(text):
     """
@@ -37,232 +52,133 @@ def sanitize_key(text):
     """
     return ''.join(c for c in text if c.isalnum())
 
-# Database Code: Initializes the database and defines methods to interact with it
-def initializeDB():
-    # Create tables for Completed, Playing, Not Played games, and Reviews
-    connection = sqlite3.connect('./peyton.db')
-    cursor = connection.cursor()
-
-    # Create Completed table with fields for 100% and On Hold status
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Completed (
-            name TEXT NOT NULL,
-            hundredpercent TEXT NOT NULL,
-            hold TEXT NOT NULL
-        );
-    ''')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Playing (
-            name TEXT NOT NULL
-        );
-    ''')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS NotPlayed (
-            name TEXT NOT NULL
-        );
-    ''')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Reviews (
-            name TEXT PRIMARY KEY,
-            review INTEGER NOT NULL
-        );
-    ''')
-    connection.commit()
-    connection.close()
-
-def get_completed():
-    # Modified to return all rows from Completed table
-    connection = sqlite3.connect('./peyton.db')
-    cursor = connection.cursor()
-    result = cursor.execute("SELECT name, hundredpercent, hold FROM Completed;").fetchall()
-    connection.close()
-    return result
-
-def get_playing():
-    # Fetch all games from the Playing table
-    connection = sqlite3.connect('./peyton.db')
-    cursor = connection.cursor()
-    result = cursor.execute("SELECT name FROM Playing;").fetchall()
-    connection.close()
-    return [r[0] for r in result]  # Convert tuples to list of names
-
-def get_notplayed():
-    # Fetch all games from the Not Played table
-    connection = sqlite3.connect('./peyton.db')
-    cursor = connection.cursor()
-    result = cursor.execute("SELECT name FROM NotPlayed;").fetchall()
-    connection.close()
-    return [r[0] for r in result]  # Convert tuples to list of names
-
-def get_reviews():
-    # Fetch all reviews from the Reviews table
-    connection = sqlite3.connect('./peyton.db')
-    cursor = connection.cursor()
-    result = cursor.execute("SELECT name, review FROM Reviews;").fetchall()
-    connection.close()
-    return {r[0]: r[1] for r in result}  # Convert to dictionary with game names as keys
-
-def add_completed(name, hundred, hold):
-    # First check if the game exists
-    connection = sqlite3.connect('./peyton.db')
-    cursor = connection.cursor()
-    
-    # Check if game already exists
-    existing = cursor.execute("SELECT * FROM Completed WHERE name = ?", (name,)).fetchone()
-    
-    if existing:
-        # Update existing record
-        cursor.execute(
-            "UPDATE Completed SET hundredpercent = ?, hold = ? WHERE name = ?;",
-            (hundred, hold, name)
-        )
+def show_chart(chart):
+    """Show a chart from charts.py, drawn by the browser from a Vega-Lite spec or as a PNG."""
+    if isinstance(chart, dict):
+        st.vega_lite_chart(chart)
     else:
-        # Insert new record
-        cursor.execute(
-            "INSERT INTO Completed (name, hundredpercent, hold) VALUES (?, ?, ?);",
-            (name, hundred, hold)
-        )
-    
-    connection.commit()
-    connection.close()
-
-def add_playing(name):
-    # Add a game to the Playing table
-    connection = sqlite3.connect('./peyton.db')
-    cursor = connection.cursor()
-    cursor.execute("INSERT INTO Playing (name) VALUES (?);", (name,))
-    connection.commit()
-    connection.close()
-
-def add_notplayed(name):
-    # Add a game to the Not Played table
-    connection = sqlite3.connect('./peyton.db')
-    cursor = connection.cursor()
-    cursor.execute("INSERT INTO NotPlayed (name) VALUES (?);", (name,))
-    connection.commit()
-    connection.close()
-
-def add_or_update_review(name, rating):
-    connection = sqlite3.connect('./peyton.db')
-    cursor = connection.cursor()
-    try:
-        # First try to update existing review
-        cursor.execute("""
-            UPDATE Reviews SET review = ? WHERE name = ?
-        """, (rating, name))
-        
-        # If no rows were updated (review didn't exist), insert new review
-        if cursor.rowcount == 0:
-            cursor.execute("""
-                INSERT INTO Reviews (name, review) VALUES (?, ?)
-            """, (name, rating))
-        
-        connection.commit()
-    except Exception as e:
-        print(f"Error updating review: {e}")
-        connection.rollback()
-    finally:
-        connection.close()
-
-# Function to remove a game from a specific category
-def remove_game(table_name, game_name):
+        st.image(chart, use_container_width=True)
+
+def format_age(seconds):
+    """Describe how long ago something happened, e.g. "3 minutes ago"."""
+    for unit, length in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= length:
+            count = int(seconds // length)
+            return f"{count} {unit}{'s' if count != 1 else ''} ago"
+    return "just now"
+
+# Seconds between checks for a finished background sync while one is running
+LIBRARY_SYNC_POLL_INTERVAL = 2
+
+@st.fragment(run_every=LIBRARY_SYNC_POLL_INTERVAL)
+def wait_for_library_sync(steam_id, fetched_at):
+    """Rerun the whole page once the background sync of the shown library finishes."""
+    cached = library_snapshot(steam_id)
+    if not refresh_status(steam_id)["refreshing"] or (cached is not None and cached[1] != fetched_at):
+        st.rerun()
+
+def show_library_snapshot(steam_id):
     """
-    Remove a game from a specified table.
-    Returns True if successful, False otherwise.
+    Return the latest synced library of an account without waiting for Steam.
+
+    Shows when the library was last synced with a button to sync it again. While
+    a sync runs in the background, the page reruns by itself once it finishes.
+
+    Args:
+        steam_id (str): The Steam account of the session.
+
+    Returns:
+        list: The owned games, or None if the account has no synced library yet.
     """
-    connection = None
-    try:
-        connection = sqlite3.connect('./peyton.db')
-        cursor = connection.cursor()
-        
-        # Validate table name to prevent SQL injection
-        valid_tables = ['Completed', 'Playing', 'NotPlayed']
-        if table_name not in valid_tables:
-            print(f"Invalid table name: {table_name}")
-            return False
-            
-        # First check if the game exists
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE name = ?", (game_name,))
-        count = cursor.fetchone()[0]
-        
-        if count > 0:
-            # Delete the game
-            cursor.execute(f"DELETE FROM {table_name} WHERE name = ?", (game_name,))
-            connection.commit()
-            
-            # Also remove from Reviews if it exists there
-            cursor.execute("DELETE FROM Reviews WHERE name = ?", (game_name,))
-            connection.commit()
-            
-            return True
-        return False
-        
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        if connection:
-            connection.rollback()
-        return False
-    finally:
-        if connection:
-            connection.close()
+    cached = library_snapshot(steam_id)
+    status = refresh_status(steam_id)
+    games, fetched_at = cached if cached is not None else (None, None)
+
+    offline = steam_offline()
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        if offline:
+            note = ":orange-background[Offline] Steam is unreachable, showing the last synced library"
+        elif status["refreshing"]:
+            note = "syncing with Steam…"
+        elif status["failed"]:
+            note = "the last sync could not reach Steam"
+        else:
+            note = None
+        if fetched_at is not None:
+            st.caption(" · ".join(filter(None, [f"Last synced {format_age(time.time() - fetched_at)}", note])))
+        elif offline:
+            st.caption(":orange-background[Offline] Steam is unreachable and this library was never synced")
+        elif status["refreshing"]:
+            st.info("Fetching your library from Steam…")
+    with col2:
+        if st.button("Sync now", key="library_sync_now", disabled=status["refreshing"]):
+            request_refresh(steam_id)
+            st.rerun()
+
+    if status["refreshing"]:
+        wait_for_library_sync(steam_id, fetched_at)
+    return games
+
+# Count database work done by this rerun only
+get_pool().reset_thread_counters()
+
+@st.cache_resource
+def initialize_database():
+    """Create and migrate the schema once per process rather than on every rerun."""
+    initializeDB()
+    return True
 
 # Initialize the database
-initializeDB()
-
-load_dotenv()
-
-# Steam OAuth Configuration
-STEAM_OPENID_URL = "https://steamcommunity.com/openid/login"
-REDIRECT_URI = "http://localhost:8501"  # Replace with your Streamlit app's URL
-STEAM_API_KEY = os.getenv("STEAM_API_KEY")
-
-# Construct the OpenID request URL
-def authenticate_with_steam():
-    params = {
-        "openid.ns": "http://specs.openid.net/auth/2.0",
-        "openid.mode": "checkid_setup",
-        "openid.return_to": REDIRECT_URI,
-        "openid.realm": REDIRECT_URI,
-        "openid.identity": "http://specs.openid.net/auth/2.0/identifier_select",
-        "openid.claimed_id": "http://specs.openid.net/auth/2.0/identifier_select",
-    }
-    auth_url = f"{STEAM_OPENID_URL}?" + urllib.parse.urlencode(params)
-    return auth_url
-
-# Validate Steam OpenID login
-def verify_steam_login(query_params):
-    validation_url = "https://steamcommunity.com/openid/login"
-    query_params["openid.mode"] = "check_authentication"
-    response = requests.post(validation_url, data=query_params)
-
-    # Check if the response is valid
-    if "is_valid:true" in response.text:
-        claimed_id = query_params.get("openid.claimed_id")
-        if claimed_id and isinstance(claimed_id, list):
-            claimed_id = claimed_id[0]  # Extract the first element if it's a list
-        if claimed_id:
-            steam_id = claimed_id.split("/")[-1]  # Extract SteamID from claimed_id URL
-            return steam_id
-    return None
-
-# Fetch user's Steam library
-def fetch_steam_library(steam_id):
-    """Fetch basic game information without genres"""
-    url = "http://api.steampowered.com/IPlayerService/GetOwnedGames/v1/"
-    params = {
-        "key": STEAM_API_KEY,
-        "steamid": steam_id,
-        "include_appinfo": True,
-        "include_played_free_games": True
-    }
-    try:
-        response = requests.get(url, params=params)
-        if response.ok:
-            return response.json().get("response", {}).get("games", [])
-        return []
-    except Exception as e:
-        print(f"Error fetching library: {e}")
-        return []
+initialize_database()
+
+# Categories a game can be put in from the Library Menu
+CATEGORY_OPTIONS = ["Completed", "Completed (100%)", "On Hold", "Playing", "Not Played"]
+
+def category_flags(category):
+    """
+    Translate a Library Menu category into how it is stored.
+
+    Args:
+        category (str): One of CATEGORY_OPTIONS.
+
+    Returns:
+        tuple: (status, hundred, hold) as taken by move_game.
+    """
+    if category == "Completed (100%)":
+        return "Completed", True, False
+    if category == "On Hold":
+        return "Completed", False, True
+    return category, False, False
+
+def category_of(status, hundred, hold):
+    """Translate how a game is stored back into its Library Menu category."""
+    if hundred:
+        return "Completed (100%)"
+    if hold:
+        return "On Hold"
+    return status
+
+# Games per page within a Sorted Menu section
+SORTED_PAGE_SIZE = 25
+
+# Sorted Menu sections in display order: title, widget key prefix, stored status
+SORTED_SECTIONS = [
+    ("Completed (100%)", "100", "Completed"),
+    ("On Hold", "hold", "Completed"),
+    ("Completed", "completed", "Completed"),
+    ("Playing", "playing", "Playing"),
+    ("Not Played", "notplayed", "Not Played"),
+]
+
+# Library Menu paging and sorting
+LIBRARY_PAGE_SIZES = [25, 50, 100, 250]
+LIBRARY_PAGE_SIZE = 50
+LIBRARY_SORTS = {
+    "Name": (lambda game: game["name"].lower(), False),
+    "Most played": (lambda game: game["playtime_forever"], True),
+    "Least played": (lambda game: game["playtime_forever"], False),
+}
 
 # Initialize session state
 if "steam_id" not in st.session_state:
@@ -274,6 +190,20 @@ if "reviews" not in st.session_state:
 if "element_counter" not in st.session_state:
     st.session_state.element_counter = 0
 
+# Restore the login of a reloaded page from its session token, without calling Steam
+if st.session_state.steam_id is None and "session" in st.query_params:
+    st.session_state.steam_id, new_token = restore_session(st.query_params["session"])
+    if st.session_state.steam_id is None:
+        # Unknown, used or expired, so the login page starts clean
+        del st.query_params["session"]
+    else:
+        # The presented token is spent, so a copied URL doesn't log in again
+        st.query_params["session"] = new_token
+
+# Keep the library of a logged-in account synced in the background
+if st.session_state.steam_id:
+    watch_library(st.session_state.steam_id)
+
 def get_unique_key(prefix="", game_name=""):
     """Generate a unique key for Streamlit elements"""
     st.session_state.element_counter += 1
@@ -310,110 +240,195 @@ if selected_menu == "Login Menu":
         query_params = st.query_params
         if query_params:
             if "openid.ns" in query_params:
-                steam_id = verify_steam_login(query_params)
+                steam_id = verify_steam_login(query_params.to_dict())
+                # The assertion is only good once, so reruns must not check it again
+                query_params.clear()
                 if steam_id:
                     st.session_state.steam_id = steam_id
+                    # Reloading the page logs back in from this token
+                    query_params["session"] = create_session(steam_id)
+                    # Start syncing the library while the user picks a page
+                    request_refresh(steam_id)
+                    watch_library(steam_id)
                     st.success(f"Logged in successfully! Steam ID: {steam_id}")
                 else:
                     st.error("Steam login failed. Please try again.")
     else:
         st.write(f"You are logged in as Steam ID: {st.session_state.steam_id}")
         if st.button("Logout"):
+            unwatch_library(st.session_state.steam_id)
+            end_session(st.query_params.get("session"))
+            st.query_params.clear()
             st.session_state.steam_id = None
             st.rerun()
 
 elif selected_menu == "Library Menu" and st.session_state.steam_id:
     # Library Section
     st.write("### Your Library")
-    library = fetch_steam_library(st.session_state["steam_id"])
-    
-    def is_game_categorized(game_name):
-        """
-        Check if a game already exists in any category.
-        Prevents duplicate categorization during automatic sorting.
-        """
-        # Check Completed table
-        completed_games = [g[0] for g in get_completed()]
-        if game_name in completed_games:
-            return True
-        
-        # Check Playing table
-        if game_name in get_playing():
-            return True
-            
-        # Check Not Played table
-        if game_name in get_notplayed():
-            return True
-            
-        return False
+    library = show_library_snapshot(st.session_state["steam_id"])
     
     if library:
-        st.write(f"Total Games: {len(library)}")
-        for game in library:
-            name = game["name"]
-            playtime = game["playtime_forever"]
-            app_id = game["appid"]
+        # Match games migrated from the old name-keyed tables to their appids
+        resolve_appids(st.session_state["steam_id"])
+
+        # Category of every categorized game, loaded once for the whole page
+        game_categories = get_game_categories()
+
+        # Only automatically categorize games that aren't already in any category.
+        # Categorized appids are loaded once, so this is a set difference rather
+        # than a query per game, and all new Not Played games share one commit.
+        uncategorized = {game["appid"] for game in library} - game_categories.keys()
+        new_games = [
+            game for game in library
+            if game["appid"] in uncategorized and game["name"] not in st.session_state.game_categories
+        ]
+        add_notplayed_many([
+            (game["appid"], game["name"]) for game in new_games if game["playtime_forever"] == 0
+        ])
+        for game in new_games:
+            st.session_state.game_categories[game["name"]] = (
+                "Not Played" if game["playtime_forever"] == 0 else ""
+            )
+            if game["playtime_forever"] == 0:
+                game_categories[game["appid"]] = ("Not Played", 0, 0)
+
+        def category_label(app_id):
+            """Return the dropdown label of a game's category, or "" if it has none."""
+            if app_id not in game_categories:
+                return ""
+            return category_of(*game_categories[app_id])
+
+        # Sorting, filtering and paging controls
+        bulk_edit = st.toggle(
+            "Bulk edit",
+            key="library_bulk_edit",
+            help="Edit the categories of every game shown in one table and save them at once.",
+        )
+        sort_col, filter_col, size_col = st.columns(3)
+        with sort_col:
+            sort_by = st.selectbox("Sort by", list(LIBRARY_SORTS), key="library_sort")
+        with filter_col:
+            category_filter = st.selectbox(
+                "Show",
+                ["All games", "Uncategorized only", *CATEGORY_OPTIONS],
+                key="library_filter",
+            )
+        with size_col:
+            page_size = st.selectbox(
+                "Games per page",
+                LIBRARY_PAGE_SIZES,
+                index=LIBRARY_PAGE_SIZES.index(LIBRARY_PAGE_SIZE),
+                key="library_page_size",
+            )
+
+        if category_filter == "All games":
+            visible_games = list(library)
+        elif category_filter == "Uncategorized only":
+            visible_games = [game for game in library if category_label(game["appid"]) == ""]
+        else:
+            visible_games = [game for game in library if category_label(game["appid"]) == category_filter]
+        sort_key, reverse = LIBRARY_SORTS[sort_by]
+        visible_games.sort(key=sort_key, reverse=reverse)
+
+        if bulk_edit:
+            # Only the bulk editor needs pandas, so it is imported here rather than at startup
+            import pandas as pd
+
+            # One table for every game shown, submitted as a single batch
+            with st.form("bulk_category_editor"):
+                edited = st.data_editor(
+                    pd.DataFrame(
+                        {
+                            "Select": False,
+                            "Game": [game["name"] for game in visible_games],
+                            "Hours played": [round(game["playtime_forever"] / 60, 1) for game in visible_games],
+                            "Category": [category_label(game["appid"]) or None for game in visible_games],
+                        },
+                        index=[game["appid"] for game in visible_games],
+                    ),
+                    column_config={
+                        "Select": st.column_config.CheckboxColumn(help="Include in \"Set selected games to\""),
+                        "Category": st.column_config.SelectboxColumn(options=CATEGORY_OPTIONS),
+                    },
+                    disabled=["Game", "Hours played"],
+                    hide_index=True,
+                    use_container_width=True,
+                    key="bulk_editor_table",
+                )
+                apply_to_selection = st.selectbox(
+                    "Set selected games to", ["Keep their category", *CATEGORY_OPTIONS]
+                )
+                submitted = st.form_submit_button("Apply changes")
+
+            if submitted:
+                changes = []
+                for app_id, row in edited.iterrows():
+                    category = row["Category"]
+                    if row["Select"] and apply_to_selection != "Keep their category":
+                        category = apply_to_selection
+                    if category and category != category_label(app_id):
+                        changes.append((app_id, row["Game"], *category_flags(category)))
+                        st.session_state.game_categories[row["Game"]] = category
+                if changes:
+                    set_statuses(changes)
+                    st.toast(f"Updated the category of {len(changes)} games.")
+                # Start the next edit from the saved categories
+                del st.session_state["bulk_editor_table"]
+                st.rerun()
+        else:
+            page_count = max(1, -(-len(visible_games) // page_size))
+            # Keep the page in range when a filter or page size change shrinks the list
+            if st.session_state.get("library_page", 1) > page_count:
+                st.session_state.library_page = page_count
+            page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="library_page")
+            page_games = visible_games[(page - 1) * page_size:page * page_size]
+
+            st.write(
+                f"Total Games: {len(library)} · showing {len(page_games)} of {len(visible_games)} "
+                f"(page {page} of {page_count})"
+            )
+
+            @st.fragment
+            def library_row(game, stored_category):
+                """
+                Render the category dropdown of one game.
+
+                Runs as a fragment, so picking a category only reruns this row instead
+                of the whole script. Counts and filters catch up on the next full rerun.
+                """
+                name = game["name"]
+                playtime = game["playtime_forever"]
+                app_id = game["appid"]
             
-            playtime_hours = round(playtime / 60, 1)
+                playtime_hours = round(playtime / 60, 1)
             
-            # Only automatically categorize if the game isn't already in any category
-            if name not in st.session_state.game_categories and not is_game_categorized(name):
-                if playtime == 0:
-                    add_notplayed(name)
-                    st.session_state.game_categories[name] = "Not Played"
-                else:
-                    st.session_state.game_categories[name] = ""
-
-            options = [
-                "Select a category",
-                "Completed",
-                "Completed (100%)",
-                "On Hold",
-                "Playing",
-                "Not Played",
-            ]
+                options = ["Select a category", *CATEGORY_OPTIONS]
             
-            # Safely get the current category, defaulting to empty string if not found
-            current_category = st.session_state.game_categories.get(name, "")
+                # The category chosen this session, otherwise the one stored in the database
+                current_category = st.session_state.game_categories.get(name) or stored_category
             
-            selection = st.selectbox(
-                f"{name} ({playtime_hours} hours played)",
-                options,
-                index=options.index(current_category) if current_category in options else 0,
-                key=f"dropdown-{name}",
-            )
-
-            if selection != "Select a category" and selection != current_category:
-                # Remove from previous category if it exists
-                if name in [g[0] for g in get_completed()]:
-                    remove_game("Completed", name)
-                elif current_category == "Playing":
-                    remove_game("Playing", name)
-                elif current_category == "Not Played":
-                    remove_game("NotPlayed", name)
-
-                # Add to new category
-                if selection == "Completed (100%)":
-                    add_completed(name, "Yes", "No")
-                elif selection == "On Hold":
-                    add_completed(name, "No", "Yes")
-                elif selection == "Completed":
-                    add_completed(name, "No", "No")
-                elif selection == "Playing":
-                    add_playing(name)
-                elif selection == "Not Played":
-                    add_notplayed(name)
-
-                st.session_state.game_categories[name] = selection
-                st.rerun()
-    else:
+                selection = st.selectbox(
+                    f"{name} ({playtime_hours} hours played)",
+                    options,
+                    index=options.index(current_category) if current_category in options else 0,
+                    key=f"dropdown-{name}",
+                )
+
+                if selection != "Select a category" and selection != current_category:
+                    # Move to the new category in one atomic statement, keeping the review
+                    move_game(app_id, *category_flags(selection), name=name)
+
+                    st.session_state.game_categories[name] = selection
+
+            for game in page_games:
+                library_row(game, category_label(game["appid"]))
+    elif library is not None:
+        st.info("Your Steam library has no games yet.")
+    elif not refresh_status(st.session_state.steam_id)["refreshing"]:
         st.error("Failed to fetch Steam library. Please try again.")
 
 if selected_menu == "Sorted Menu" and st.session_state.steam_id:
     st.write("### Categorized Games")
-    
-    completed_games = get_completed()
-    reviews = get_reviews()
 
     def handle_removal(category_name, game_name):
         """
@@ -427,17 +442,11 @@ if selected_menu == "Sorted Menu" and st.session_state.steam_id:
         Returns:
             bool: True if successful, False otherwise.
         """
-        category_table_map = {
-            "Completed": "Completed",
-            "Playing": "Playing",
-            "Not Played": "NotPlayed"
-        }
-
-        table_name = category_table_map.get(category_name)
-
-        if table_name:
+        if category_name in GAME_STATUSES:
+            # Drop any queued rating so it can't bring the review back
+            discard_review(game_name)
             # Remove from database
-            if remove_game(table_name, game_name):
+            if remove_game(category_name, game_name):
                 # Clean up session state
                 if game_name in st.session_state.game_categories:
                     del st.session_state.game_categories[game_name]
@@ -454,303 +463,216 @@ if selected_menu == "Sorted Menu" and st.session_state.steam_id:
         # Get the new rating value from session state using the slider's key
         if rating_key in st.session_state:
             new_rating = st.session_state[rating_key]
-            # Update the review in the database
-            add_or_update_review(game_name, new_rating)
+            # Queue the review for the background writer
+            queue_review(game_name, new_rating)
             # Update the session state reviews
             st.session_state.reviews[game_name] = new_rating
 
-    # Display Completed (100%) games
-    with st.expander("**Completed (100%)**", expanded=True):
-        hundred_percent_games = [game for game in completed_games if game[1] == "Yes"]
-        if hundred_percent_games:
-            for idx, game in enumerate(hundred_percent_games):
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    current_rating = reviews.get(game[0], 0)
-                    rating_key = f"rating_100_{sanitize_key(game[0])}_{idx}"
-                    rating = st.slider(
-                        f"Rate {game[0]}",
-                        min_value=0,
-                        max_value=5,
-                        value=current_rating,
-                        key=rating_key,
-                        on_change=handle_rating_change,
-                        args=(game[0], rating_key)
-                    )
-                with col2:
-                    remove_key = f"remove_100_{sanitize_key(game[0])}_{idx}"
-                    if st.button("Remove", key=remove_key):
-                        if handle_removal("Completed", game[0]):
-                            st.success(f"Removed {game[0]}")
-                            st.rerun()
-        else:
-            st.write("No games in this category.")
-
-    # Display On Hold games
-    with st.expander("**On Hold**", expanded=True):
-        on_hold_games = [game for game in completed_games if game[2] == "Yes"]
-        if on_hold_games:
-            for idx, game in enumerate(on_hold_games):
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    current_rating = reviews.get(game[0], 0)
-                    rating_key = f"rating_hold_{sanitize_key(game[0])}_{idx}"
-                    rating = st.slider(
-                        f"Rate {game[0]}",
-                        min_value=0,
-                        max_value=5,
-                        value=current_rating,
-                        key=rating_key,
-                        on_change=handle_rating_change,
-                        args=(game[0], rating_key)
-                    )
-                with col2:
-                    remove_key = f"remove_hold_{sanitize_key(game[0])}_{idx}"
-                    if st.button("Remove", key=remove_key):
-                        if handle_removal("Completed", game[0]):
-                            st.success(f"Removed {game[0]}")
-                            st.rerun()
-        else:
-            st.write("No games in this category.")
-
-    # Display regular Completed games
-    with st.expander("**Completed**", expanded=True):
-        regular_completed = [game for game in completed_games if game[1] == "No" and game[2] == "No"]
-        if regular_completed:
-            for idx, game in enumerate(regular_completed):
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    current_rating = reviews.get(game[0], 0)
-                    rating_key = f"rating_completed_{sanitize_key(game[0])}_{idx}"
-                    rating = st.slider(
-                        f"Rate {game[0]}",
-                        min_value=0,
-                        max_value=5,
-                        value=current_rating,
-                        key=rating_key,
-                        on_change=handle_rating_change,
-                        args=(game[0], rating_key)
-                    )
-                with col2:
-                    remove_key = f"remove_completed_{sanitize_key(game[0])}_{idx}"
-                    if st.button("Remove", key=remove_key):
-                        if handle_removal("Completed", game[0]):
-                            st.success(f"Removed {game[0]}")
-                            st.rerun()
-        else:
-            st.write("No games in this category.")
-
-    # Display Playing games
-    with st.expander("**Playing**", expanded=True):
-        playing_games = get_playing()
-        if playing_games:
-            for idx, game in enumerate(playing_games):
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    current_rating = reviews.get(game, 0)
-                    rating_key = f"rating_playing_{sanitize_key(game)}_{idx}"
-                    rating = st.slider(
-                        f"Rate {game}",
-                        min_value=0,
-                        max_value=5,
-                        value=current_rating,
-                        key=rating_key,
-                        on_change=handle_rating_change,
-                        args=(game, rating_key)
-                    )
-                with col2:
-                    remove_key = f"remove_playing_{sanitize_key(game)}_{idx}"
-                    if st.button("Remove", key=remove_key):
-                        if handle_removal("Playing", game):
-                            st.success(f"Removed {game}")
-                            st.rerun()
-        else:
-            st.write("No games in this category.")
-
-    # Display Not Played games
-    with st.expander("**Not Played**", expanded=True):
-        not_played_games = get_notplayed()
-        if not_played_games:
-            for idx, game in enumerate(not_played_games):
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    current_rating = reviews.get(game, 0)
-                    rating_key = f"rating_notplayed_{sanitize_key(game)}_{idx}"
-                    rating = st.slider(
-                        f"Rate {game}",
-                        min_value=0,
-                        max_value=5,
-                        value=current_rating,
-                        key=rating_key,
-                        on_change=handle_rating_change,
-                        args=(game, rating_key)
-                    )
-                with col2:
-                    remove_key = f"remove_notplayed_{sanitize_key(game)}_{idx}"
-                    if st.button("Remove", key=remove_key):
-                        if handle_removal("Not Played", game):
-                            st.success(f"Removed {game}")
-                            st.rerun()
-        else:
-            st.write("No games in this category.")
+    @st.fragment
+    def sorted_row(game_name, category_name, key_prefix, idx, current_rating):
+        """
+        Render the rating slider and Remove button of one game.
+
+        Runs as a fragment, so moving the slider only reruns this row. Removing a
+        game still reruns the whole page so it disappears from its section.
+        """
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            rating_key = f"rating_{key_prefix}_{sanitize_key(game_name)}_{idx}"
+            st.slider(
+                f"Rate {game_name}",
+                min_value=0,
+                max_value=5,
+                value=current_rating,
+                key=rating_key,
+                on_change=handle_rating_change,
+                args=(game_name, rating_key)
+            )
+        with col2:
+            remove_key = f"remove_{key_prefix}_{sanitize_key(game_name)}_{idx}"
+            if st.button("Remove", key=remove_key):
+                if handle_removal(category_name, game_name):
+                    st.success(f"Removed {game_name}")
+                    st.rerun()
+
+    @st.fragment
+    def sorted_section(title, key_prefix, status, game_count):
+        """
+        Render one Sorted Menu section, loading its games only while it is open.
+
+        Runs as a fragment, so opening a section or turning its pages only reruns
+        that section.
+        """
+        # The count stays out of the label, since a changed label resets the toggle
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            is_open = st.toggle(f"**{title}**", key=f"sorted_open_{key_prefix}")
+        with col2:
+            st.caption(f"{game_count} games")
+        if not is_open:
+            return
+        with st.container(border=True):
+            if game_count == 0:
+                st.write("No games in this category.")
+                return
+
+            page_count = -(-game_count // SORTED_PAGE_SIZE)
+            page = 1
+            if page_count > 1:
+                page_key = f"sorted_page_{key_prefix}"
+                # Keep the page in range when removals shrink the section
+                if st.session_state.get(page_key, 1) > page_count:
+                    st.session_state[page_key] = page_count
+                page = st.number_input(
+                    f"Page (of {page_count})", min_value=1, max_value=page_count, step=1, key=page_key
+                )
+
+            offset = (page - 1) * SORTED_PAGE_SIZE
+            games = get_category_page(*category_flags(title), SORTED_PAGE_SIZE, offset)
+            # Ratings still waiting for the writer are newer than the database
+            queued = pending_reviews()
+            for idx, (game_name, rating) in enumerate(games, start=offset):
+                sorted_row(game_name, status, key_prefix, idx, queued.get(game_name, rating))
+
+    # Section headers only need counts, from one GROUP BY on an index
+    category_counts = {
+        category_of(*flags): count for flags, count in get_category_counts().items()
+    }
+    for title, key_prefix, status in SORTED_SECTIONS:
+        sorted_section(title, key_prefix, status, category_counts.get(title, 0))
 
 elif selected_menu == "Visual Stats" and st.session_state.steam_id:
+    # NumPy, pandas and the charting libraries are only loaded by sessions that get here
+    # Vectorized library statistics
+    from stats import library_stats
+    # To create visual representations
+    from charts import genre_charts, playtime_distribution_charts
+
     st.write("### Genre Statistics")
     
-    # Fetch library if not already in session state
-    library = fetch_steam_library(st.session_state.steam_id)
+    # The latest synced library, without waiting for Steam
+    library = show_library_snapshot(st.session_state.steam_id)
     
     if library:
         st.write(f"Analyzing {len(library)} games in your library...")
+
+        # Use real store genres where they are known and fetch the rest in the background
+        known_metadata = get_appids_with_metadata()
+        missing_metadata = [game["appid"] for game in library if game["appid"] not in known_metadata]
+        if missing_metadata:
+            fetch_missing_metadata_in_background(missing_metadata)
+            st.caption(
+                f"Store genres known for {len(library) - len(missing_metadata)} of {len(library)} "
+                "games so far; the rest are guessed from their names until they are fetched."
+            )
         
-        # Process genre data
-        genre_data = {
-            'Action': {'total_playtime': 0, 'game_count': 0},
-            'Adventure': {'total_playtime': 0, 'game_count': 0},
-            'RPG': {'total_playtime': 0, 'game_count': 0},
-            'Strategy': {'total_playtime': 0, 'game_count': 0},
-            'Simulation': {'total_playtime': 0, 'game_count': 0},
-            'Sports': {'total_playtime': 0, 'game_count': 0},
-            'Indie': {'total_playtime': 0, 'game_count': 0},
-            'Other': {'total_playtime': 0, 'game_count': 0}
-        }
-        
-        for game in library:
-            playtime = game.get('playtime_forever', 0) / 60  # Convert to hours
-            
-            # Expanded keyword lists for better genre detection
-            action_keywords = {'action', 'shooter', 'fps', 'fight', 'combat', 'battle', 'warfare', 'war', 'dead', 'doom', 
-                             'counter', 'strike', 'call of duty', 'battlefield', 'halo', 'metal gear', 'sleeping dogs', 'turok',
-                             'resident evil', 'hitman', 'portal', 'borderlands', 'space marine', 'wukong', 'sekiro', 'metro', 'max payne', 'half-life'}
-            
-            adventure_keywords = {'adventure', 'quest', 'journey', 'exploration', 'tomb raider', 'uncharted', 's.t.a.l.k.e.r.', 'red dead redemption',
-                                'assassin', 'walking', 'life is strange', 'telltale', 'story', 'tsushima', 'last of us', 'dying light', }
-            
-            rpg_keywords = {'rpg', 'role', 'fantasy', 'witcher', 'elder scrolls', 'fallout', 'final fantasy', 
-                           'mass effect', 'dragon', 'souls', 'persona', 'dark souls', 'skyrim', 'diablo', 'chrono trigger', # goated game
-                           'kingdom', 'divinity', 'baldur', 'deus ex', 'elden', 'path of exile', 'dragon', 'cyberpunk'}
-            
-            strategy_keywords = {'strategy', 'tactic', 'command', 'civilization', 'total war', 'hearts of iron',
-                               'crusader kings', 'age of empires', 'starcraft', 'dawn of war', 'xcom', 'stellaris',
-                               'city builder', 'management', 'defense', 'tower'}
-            
-            simulation_keywords = {'simulation', 'simulator', 'tycoon', 'farm', 'euro truck', 'flight', 'sims',
-                                 'cities:', 'city:', 'planet', 'zoo', 'hospital', 'cooking', 'fishing', 'train',
-                                 'building', 'construction'}
-            
-            sports_keywords = {'sports', 'football', 'soccer', 'basketball', 'nba', 'fifa', 'baseball', 'racing',
-                             'race', 'car', 'drift', 'rally', 'forza', 'need for speed', 'dirt', 'golf', 'tennis',
-                             'skateboard', 'skate', 'tony hawk', 'motorsport', 'rugby', 'hockey'}
-            
-            indie_keywords = {'indie', 'pixel', 'roguelike', 'rogue', 'platformer', 'puzzle', 'stardew', 'terraria',
-                            'minecraft', 'undertale', 'hollow knight', 'binding of isaac', 'inside', 'limbo', 
-                            'celeste', 'hades', "don't starve", 'castle crashers', 'balatro'}
+        # Classify only games that are new or out of date, then use the cached columns
+        classify_library(st.session_state.steam_id)
+        snapshot = library_stats([st.session_state.steam_id])
+        view = st.radio(
+            "View", ["Genres", "Playtime distribution"], horizontal=True, key="visual_stats_view"
+        )
 
-            name = game.get('name', '').lower()
-            
-            # More sophisticated genre detection
-            if any(keyword in name for keyword in action_keywords):
-                genre = 'Action'
-            elif any(keyword in name for keyword in adventure_keywords):
-                genre = 'Adventure'
-            elif any(keyword in name for keyword in rpg_keywords):
-                genre = 'RPG'
-            elif any(keyword in name for keyword in strategy_keywords):
-                genre = 'Strategy'
-            elif any(keyword in name for keyword in simulation_keywords):
-                genre = 'Simulation'
-            elif any(keyword in name for keyword in sports_keywords):
-                genre = 'Sports'
-            elif any(keyword in name for keyword in indie_keywords):
-                genre = 'Indie'
+        if view == "Playtime distribution":
+            counts, edges, unplayed = snapshot.playtime_histogram
+            if counts.sum():
+                show_chart(playtime_distribution_charts(counts, edges, snapshot.category_cdfs))
+                st.caption(
+                    f"{unplayed} games that were never played are left out of the histogram, "
+                    "but count towards the cumulative distributions."
+                )
             else:
-                genre = 'Other'
-            
-            genre_data[genre]['total_playtime'] += playtime
-            genre_data[genre]['game_count'] += 1
-        
-        # Calculate average playtime for each genre
-        avg_playtime = {
-            genre: data['total_playtime'] / data['game_count'] if data['game_count'] > 0 else 0
-            for genre, data in genre_data.items()
-        }
-        
-        # Remove genres with no games
-        avg_playtime = {k: v for k, v in avg_playtime.items() if v > 0}
-        
-        # Create the visualizations with dark theme
-        plt.style.use('dark_background')
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
+                st.warning("No playtime data available for analysis.")
+        else:
+            genre_summary = snapshot.genre_summary
+            # Remove genres with no playtime
+            genre_summary = genre_summary[genre_summary['sum'] > 0]
         
-        # Set figure background color to match website
-        fig.patch.set_facecolor('#1E1E1E')
-        ax1.set_facecolor('#1E1E1E')
-        ax2.set_facecolor('#1E1E1E')
+            # Average playtime for each genre in hours, in genre order
+            avg_playtime = (genre_summary['mean'] / 60).to_dict()
         
-        # Pie chart
-        values = list(avg_playtime.values())
-        labels = list(avg_playtime.keys())
+            values = list(avg_playtime.values())
+            labels = list(avg_playtime.keys())
         
-        if values:  # Only create charts if we have data
-            wedges, texts, autotexts = ax1.pie(
-                values,
-                labels=labels,
-                autopct='%1.1f%%',
-                textprops={'fontsize': 8, 'color': 'white'},
-                colors=plt.cm.Set3.colors
-            )
-            ax1.set_title('Distribution of Average Playtime by Genre', color='white')
-            
-            # Bar chart
-            y_pos = np.arange(len(labels))
-            game_counts = [genre_data[genre]['game_count'] for genre in labels]
+            if values:  # Only create charts if we have data
+                game_counts = genre_summary['count'].to_dict()
+                median_playtime = (genre_summary['median'] / 60).to_dict()
             
-            ax2.barh(y_pos, values, color=plt.cm.Set3.colors)
-            ax2.set_yticks(y_pos)
-            ax2.set_yticklabels(labels, color='white')
-            ax2.invert_yaxis()
-            ax2.set_xlabel('Average Hours Played', color='white')
-            ax2.set_title('Average Playtime by Genre', color='white')
+                # Display the chart in Streamlit, built only when the data changed
+                show_chart(genre_charts(avg_playtime, game_counts))
             
-            # Make axis labels white
-            ax2.tick_params(colors='white')
-            ax2.xaxis.label.set_color('white')
+                # Display detailed statistics
+                st.write("### Detailed Statistics")
             
-            # Add game count annotations in white
-            for i, v in enumerate(values):
-                ax2.text(v + 1, i, f'({game_counts[i]} games)', va='center', fontsize=8, color='white')
+                # Create a two-column layout for statistics
+                col1, col2 = st.columns(2)
             
-            plt.tight_layout()
+                # Sort genres by average playtime
+                sorted_stats = sorted(
+                    [(genre, avg_playtime[genre], median_playtime[genre], game_counts[genre])
+                     for genre in labels],
+                    key=lambda x: x[1],
+                    reverse=True
+                )
             
-            # Display the chart in Streamlit
-            st.pyplot(fig)
+                # Split the stats between columns
+                mid_point = len(sorted_stats) // 2
             
-            # Display detailed statistics
-            st.write("### Detailed Statistics")
-            
-            # Create a two-column layout for statistics
-            col1, col2 = st.columns(2)
-            
-            # Sort genres by average playtime
-            sorted_stats = sorted(
-                [(genre, avg_playtime[genre], genre_data[genre]['game_count']) 
-                 for genre in labels],
-                key=lambda x: x[1],
-                reverse=True
-            )
-            
-            # Split the stats between columns
-            mid_point = len(sorted_stats) // 2
-            
-            with col1:
-                for genre, avg_time, count in sorted_stats[:mid_point]:
-                    st.write(f"**{genre}**: {avg_time:.1f} hours avg. ({count} games)")
+                with col1:
+                    for genre, avg_time, median_time, count in sorted_stats[:mid_point]:
+                        st.write(f"**{genre}**: {avg_time:.1f} hours avg., {median_time:.1f} median ({count} games)")
                     
-            with col2:
-                for genre, avg_time, count in sorted_stats[mid_point:]:
-                    st.write(f"**{genre}**: {avg_time:.1f} hours avg. ({count} games)")
-        else:
-            st.warning("No playtime data available for analysis.")
+                with col2:
+                    for genre, avg_time, median_time, count in sorted_stats[mid_point:]:
+                        st.write(f"**{genre}**: {avg_time:.1f} hours avg., {median_time:.1f} median ({count} games)")
+            else:
+                st.warning("No playtime data available for analysis.")
             
-    else:
+    elif library is not None:
+        st.info("Your Steam library has no games yet.")
+    elif not refresh_status(st.session_state.steam_id)["refreshing"]:
         st.error("Failed to fetch library data. Please try again.")
+
+# Database churn for this rerun and Steam latency, to confirm reuse is working
+with st.sidebar.expander("Diagnostics"):
+    db_counters = get_pool().counters()
+    st.caption(
+        f"DB this rerun: {db_counters['connections_opened']} connections opened, "
+        f"{db_counters['statements_run']} statements run"
+    )
+    for endpoint, histogram in latency_histograms().items():
+        if histogram["count"]:
+            buckets = " · ".join(
+                f"{'≤' + format(bound, 'g') + 's' if bound != float('inf') else 'slower'}: {count}"
+                for bound, count in histogram["buckets"].items() if count
+            )
+            st.caption(
+                f"Steam {endpoint}: {histogram['count']} requests, "
+                f"{histogram['mean_seconds'] * 1000:.0f} ms mean ({buckets})"
+            )
+    for host, breaker in breaker_states().items():
+        if breaker["state"] != "closed" or breaker["rejected"]:
+            st.caption(
+                f"Steam {host}: circuit {breaker['state'].replace('_', '-')}, "
+                f"{breaker['failures']} failures in a row, {breaker['rejected']} calls rejected"
+            )
+    refreshes = refresh_metrics()
+    st.caption(
+        f"Library syncs: {refreshes['completed']} done, {refreshes['failed']} failed, "
+        f"{refreshes['in_flight']} running, {refreshes['deduplicated']} shared by concurrent requests, "
+        f"{refreshes['watched']} accounts watched"
+    )
+    # Charts are only loaded once some session has opened Visual Stats
+    charts = sys.modules.get("charts")
+    if charts is not None:
+        st.caption(
+            f"Chart cache: {charts.chart_cache_stats['hits']} hits, "
+            f"{charts.chart_cache_stats['misses']} builds"
+        )
+    writer = review_writer_metrics()
+    st.caption(
+        f"Review writer: {writer['queue_depth']} queued, {writer['written']} written in "
+        f"{writer['flushes']} flushes ({writer['coalesced']} coalesced), "
+        f"{writer['mean_flush_seconds'] * 1000:.1f} ms mean flush, "
+        f"{writer['max_wait_seconds'] * 1000:.0f} ms max wait"
+    )
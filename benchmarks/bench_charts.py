@@ -0,0 +1,95 @@
+"""
+Server CPU per Visual Stats rerun with Altair specs versus Matplotlib PNGs.
+
+Drives backlogr.py with Streamlit's AppTest against a fake Steam library and
+measures the process CPU time of each rerun of both Visual Stats views, once
+with the chart cache cleared before every rerun, as when the library changed,
+and once with it warm. The size of what each backend sends to the browser is
+reported too. Browser-side drawing of the Vega-Lite specs is not included, which
+is the point: that work moves off the server.
+
+Usage: python benchmarks/bench_charts.py [library size] [repeats]
+"""
+
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO)
+
+from streamlit.testing.v1 import AppTest
+
+import charts
+import steam
+import store_metadata
+
+VIEWS = ("Genres", "Playtime distribution")
+
+def fake_library(size, seed=0):
+    # Names that land in several genres, and a long tail of playtimes
+    rng = random.Random(seed)
+    titles = ['Doom', 'Quest', 'Tycoon', 'Rally', 'Souls', 'Tactics', 'Puzzle', 'Garden']
+    return [
+        {
+            "appid": appid,
+            "name": f"{rng.choice(titles)} {appid}",
+            "playtime_forever": 0 if rng.random() < 0.3 else int(rng.lognormvariate(5, 1.8)),
+            "rtime_last_played": 0,
+        }
+        for appid in range(1, size + 1)
+    ]
+
+def cpu_per_rerun(app, view, repeats, cold):
+    # Median process CPU time of rerunning one view
+    samples = []
+    for _ in range(repeats):
+        if cold:
+            charts._chart_cache.clear()
+        start = time.process_time()
+        app.radio(key="visual_stats_view").set_value(view).run()
+        samples.append(time.process_time() - start)
+    return statistics.median(samples) * 1000
+
+def payload_kilobytes():
+    # Size of every cached chart as it is sent to the browser
+    sizes = [
+        len(chart) if isinstance(chart, bytes) else len(json.dumps(chart))
+        for chart in charts._chart_cache.values()
+    ]
+    return sum(sizes) / 1024
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    os.chdir(tempfile.mkdtemp())
+    library = fake_library(size)
+    steam.request_owned_games = lambda steam_id: library
+    # Keep storefront fetches from using CPU in the background
+    store_metadata.fetch_missing_metadata_in_background = lambda appids: False
+
+    app = AppTest.from_file(os.path.join(REPO, 'backlogr.py'), default_timeout=120)
+    app.run()
+    app.session_state.steam_id = 'bench'
+    steam.request_refresh('bench').result()
+    app.run()
+    app.sidebar.radio[0].set_value("Library Menu").run()
+    app.sidebar.radio[0].set_value("Visual Stats").run()
+
+    for backend in ('matplotlib', 'altair'):
+        charts.CHART_BACKEND = backend
+        charts._chart_cache.clear()
+        for view in VIEWS:
+            cold = cpu_per_rerun(app, view, repeats, cold=True)
+            warm = cpu_per_rerun(app, view, repeats, cold=False)
+            print(f"{backend:>10} {view:>21}: {cold:7.1f} ms CPU per rerun with the chart "
+                  f"built, {warm:6.1f} ms cached")
+        print(f"{backend:>10} sends {payload_kilobytes():.1f} KB for both views")
+
+if __name__ == '__main__':
+    main()
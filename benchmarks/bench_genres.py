@@ -0,0 +1,58 @@
+"""
+Micro-benchmark of name-based genre guessing.
+
+Compares the per-game cost of the old Visual Stats loop, which rebuilt every
+keyword set and ran one any() scan per genre for each game, with the classifier
+compiled once in genres.py. Both are run over the same synthetic corpus and
+must agree on every name.
+
+Usage: python benchmarks/bench_genres.py [corpus size]
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from genres import GENRE_KEYWORDS, classify_genre
+
+FILLER_WORDS = ['the', 'of', 'legend', 'night', 'lost', 'edition', 'remastered', 'ii', 'iii',
+                'definitive', 'chronicles', 'shadow', 'iron', 'sky', 'ocean', 'echoes', 'zero']
+
+def legacy_classify(name):
+    # The loop body Visual Stats used before, keyword sets rebuilt on every call
+    keyword_sets = [set(keywords) for _, keywords in GENRE_KEYWORDS]
+    name = name.lower()
+    for (genre, _), keywords in zip(GENRE_KEYWORDS, keyword_sets):
+        if any(keyword in name for keyword in keywords):
+            return genre
+    return 'Other'
+
+def make_corpus(size, seed=0):
+    # Names of two to five words, about a third of them containing a keyword
+    rng = random.Random(seed)
+    keywords = [keyword for _, group in GENRE_KEYWORDS for keyword in sorted(group)]
+    corpus = []
+    for _ in range(size):
+        words = rng.choices(FILLER_WORDS, k=rng.randint(2, 5))
+        if rng.random() < 0.35:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        corpus.append(' '.join(words).title())
+    return corpus
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    corpus = make_corpus(size)
+
+    mismatches = [name for name in corpus if legacy_classify(name) != classify_genre(name)]
+    if mismatches:
+        sys.exit(f"Classifiers disagree on {len(mismatches)} names, e.g. {mismatches[:3]}")
+
+    for label, classify in (('legacy keyword scan', legacy_classify), ('compiled classifier', classify_genre)):
+        seconds = min(timeit.repeat(lambda: [classify(name) for name in corpus], number=1, repeat=3))
+        print(f"{label:>20}: {seconds * 1e6 / size:7.2f} us/game, {seconds * 1000:8.1f} ms for {size} names")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Server-side latency of single-row interactions in the Library and Sorted menus.
+
+Drives backlogr.py with Streamlit's AppTest against a fake Steam library. AppTest
+always reruns the whole script, which is what every dropdown or slider change
+cost before rows became fragments (category changes even ran it twice, through
+st.rerun). Every fragment call is timed as well; a fragment-scoped rerun runs
+exactly one of those calls, so their median is what an interaction costs now.
+Browser and websocket time are not included in either number.
+
+Usage: python benchmarks/bench_interactions.py [library size] [repeats]
+"""
+
+import functools
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO)
+
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+import steam
+import store_metadata
+
+fragment_times = defaultdict(list)
+_real_fragment = streamlit.fragment
+
+def timed_fragment(func=None, **kwargs):
+    # Stand-in for st.fragment that records how long each fragment call takes
+    def decorate(function):
+        @functools.wraps(function)
+        def timed(*args, **inner_kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **inner_kwargs)
+            finally:
+                fragment_times[function.__name__].append(time.perf_counter() - start)
+        return _real_fragment(timed, **kwargs)
+    return decorate(func) if func is not None else decorate
+
+def fake_library(size):
+    # Every game unplayed, so they all land in Not Played with a rating slider each
+    return [
+        {"appid": appid, "name": f"Game {appid}", "playtime_forever": 0, "rtime_last_played": 0}
+        for appid in range(1, size + 1)
+    ]
+
+def measure(app, interact, fragment_name, repeats):
+    # Median full rerun after an interaction, and median single fragment call
+    full_runs, fragment_runs = [], []
+    for attempt in range(repeats):
+        fragment_times.clear()
+        start = time.perf_counter()
+        interact(app, attempt).run()
+        full_runs.append(time.perf_counter() - start)
+        fragment_runs.extend(fragment_times[fragment_name])
+    return statistics.median(full_runs) * 1000, statistics.median(fragment_runs) * 1000
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    os.chdir(tempfile.mkdtemp())
+    library = fake_library(size)
+    steam.request_owned_games = lambda steam_id: library
+    # Keep storefront fetches from using CPU in the background
+    store_metadata.fetch_missing_metadata_in_background = lambda appids: False
+    streamlit.fragment = timed_fragment
+
+    app = AppTest.from_file(os.path.join(REPO, 'backlogr.py'), default_timeout=120)
+    app.run()
+    app.session_state.steam_id = 'bench'
+    steam.request_refresh('bench').result()
+    app.run()
+
+    app.sidebar.radio[0].set_value("Library Menu").run()
+    dropdowns = [box for box in app.selectbox if box.key.startswith("dropdown-")]
+    library_full, library_row = measure(
+        app,
+        lambda app, attempt: app.selectbox(key=dropdowns[attempt % len(dropdowns)].key)
+        .set_value(["Playing", "Not Played"][attempt % 2]),
+        "library_row",
+        repeats,
+    )
+
+    app.sidebar.radio[0].set_value("Sorted Menu").run()
+    # Sections start closed, and every fake game is in Not Played
+    app.toggle(key="sorted_open_notplayed").set_value(True).run()
+    sliders = list(app.slider)
+    sorted_full, sorted_row = measure(
+        app,
+        lambda app, attempt: app.slider(key=sliders[attempt % len(sliders)].key)
+        .set_value(attempt % 5 + 1),
+        "sorted_row",
+        repeats,
+    )
+
+    print(f"{size} games, median of {repeats} interactions (server-side script time)")
+    print(f"{'interaction':>28} {'full rerun':>12} {'fragment rerun':>16}")
+    print(f"{'Library Menu category change':>28} {library_full:10.1f}ms {library_row:14.2f}ms")
+    print(f"{'Sorted Menu rating change':>28} {sorted_full:10.1f}ms {sorted_row:14.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Cold start and warm rerun times of backlogr.py.
+
+Each sample starts a fresh Python process that drives the app with Streamlit's
+AppTest against a fake Steam library, so module imports and one-time setup are
+paid again. The first run of a page is the cold start of a new server process;
+the median of the runs after it is what a warm rerun costs. The heavy modules
+that got imported along the way are listed, to show which pages load them.
+
+Usage: python benchmarks/bench_startup.py [samples] [reruns]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HEAVY_MODULES = ('numpy', 'pandas', 'matplotlib', 'altair')
+PAGES = ("Login Menu", "Library Menu", "Sorted Menu", "Visual Stats")
+
+# Runs in the child process and prints its result as JSON
+CHILD = r'''
+import json, os, sys, tempfile, time
+sys.path.insert(0, sys.argv[1])
+os.chdir(tempfile.mkdtemp())
+page, reruns, heavy_modules = sys.argv[2], int(sys.argv[3]), json.loads(sys.argv[4])
+
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+import steam
+import store_metadata
+steam.request_owned_games = lambda steam_id: [
+    {"appid": appid, "name": f"Game {appid}", "playtime_forever": appid * 7 % 600, "rtime_last_played": 0}
+    for appid in range(1, 501)
+]
+store_metadata.fetch_missing_metadata_in_background = lambda appids: False
+app = AppTest.from_file(os.path.join(sys.argv[1], 'backlogr.py'), default_timeout=120)
+app.session_state.steam_id = None if page == "Login Menu" else 'bench'
+if page != "Login Menu":
+    app.session_state.navigation = page
+    # Pages no longer wait for Steam, so sync the library up front as a login would
+    steam.request_refresh('bench').result()
+app.run()
+cold = time.perf_counter() - start
+
+warm = []
+for _ in range(reruns):
+    start = time.perf_counter()
+    app.run()
+    warm.append(time.perf_counter() - start)
+print(json.dumps({
+    "cold": cold,
+    "warm": sorted(warm)[len(warm) // 2],
+    "modules": [name for name in heavy_modules if name in sys.modules],
+    "exceptions": len(app.exception),
+}))
+'''
+
+def sample(page, reruns):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, REPO, page, str(reruns), json.dumps(HEAVY_MODULES)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    reruns = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    for page in PAGES:
+        results = [sample(page, reruns) for _ in range(samples)]
+        if any(result["exceptions"] for result in results):
+            sys.exit(f"{page} raised an exception")
+        cold = statistics.median(result["cold"] for result in results) * 1000
+        warm = statistics.median(result["warm"] for result in results) * 1000
+        modules = ", ".join(results[0]["modules"]) or "none"
+        print(f"{page:>13}: {cold:7.0f} ms cold start, {warm:6.1f} ms warm rerun, heavy imports: {modules}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark of Visual Stats aggregation over a merged multi-account library.
+
+Compares a per-game Python loop over the Steam JSON dicts, the way Visual Stats
+used to aggregate, with the vectorized functions in stats.py. Both compute the
+per-genre count, total, mean and median playtime and the ten most played games,
+and must agree. Loading the library into columns is timed separately, since a
+page loads it once and then derives every chart from it.
+
+Usage: python benchmarks/bench_stats.py [games per account] [accounts]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from db import initializeDB, store_cached_library, store_genre_classifications
+from genres import CLASSIFIER_VERSION, GENRES
+from stats import group_histogram, group_summary, load_library_frame, top_n
+
+def make_library(size, seed):
+    # Mostly short playtimes with a long tail, like real libraries
+    rng = random.Random(seed)
+    library = []
+    for appid in rng.sample(range(1, size * 3), size):
+        playtime = 0 if rng.random() < 0.4 else int(rng.lognormvariate(5, 1.8))
+        windows = rng.randint(0, playtime)
+        library.append({
+            "appid": appid,
+            "name": f"Game {appid}",
+            "playtime_forever": playtime,
+            "playtime_windows_forever": windows,
+            "playtime_deck_forever": playtime - windows,
+            "rtime_last_played": rng.randint(1_400_000_000, 1_700_000_000) if playtime else 0,
+        })
+    return library
+
+def legacy_stats(libraries, genres):
+    # Grouped sums and medians with dicts and lists, one game at a time
+    playtimes = {}
+    for library in libraries:
+        for game in library:
+            genre = genres[game["appid"]]
+            playtimes.setdefault(genre, []).append(game["playtime_forever"])
+    summary = {
+        genre: (len(values), sum(values), sum(values) / len(values), statistics.median(values))
+        for genre, values in playtimes.items()
+    }
+    everything = [game for library in libraries for game in library]
+    top = sorted(everything, key=lambda game: game["playtime_forever"], reverse=True)[:10]
+    return summary, [game["playtime_forever"] for game in top]
+
+def vectorized_stats(frame):
+    summary = group_summary(frame, by='genre')
+    group_histogram(frame, np.logspace(0, 6, 25), by='genre')
+    top = top_n(frame, 10)
+    return summary, top['playtime_forever'].tolist()
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    accounts = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    os.chdir(tempfile.mkdtemp())
+    initializeDB()
+    libraries = [make_library(size, seed) for seed in range(accounts)]
+    rng = random.Random(0)
+    genres = {game["appid"]: rng.choice(GENRES) for library in libraries for game in library}
+    for seed, library in enumerate(libraries):
+        store_cached_library(f"account-{seed}", library)
+    store_genre_classifications(genres, CLASSIFIER_VERSION)
+    steam_ids = [f"account-{seed}" for seed in range(accounts)]
+
+    frame = load_library_frame(steam_ids)
+    legacy_summary, legacy_top = legacy_stats(libraries, genres)
+    summary, top = vectorized_stats(frame)
+    for genre, (count, total, mean, median) in legacy_summary.items():
+        row = summary.loc[genre]
+        if (row['count'], row['sum']) != (count, total) or not np.isclose([row['mean'], row['median']], [mean, median]).all():
+            sys.exit(f"Summaries disagree for {genre}: {tuple(row)} vs {(count, total, mean, median)}")
+    if top != legacy_top:
+        sys.exit(f"Top games disagree: {top} vs {legacy_top}")
+
+    rows = len(frame)
+    timings = (
+        ('load into columns', lambda: load_library_frame(steam_ids)),
+        ('legacy dict loop', lambda: legacy_stats(libraries, genres)),
+        ('vectorized stats', lambda: vectorized_stats(frame)),
+    )
+    for label, run in timings:
+        seconds = min(timeit.repeat(run, number=1, repeat=5))
+        print(f"{label:>18}: {seconds * 1000:8.1f} ms for {rows} games")
+
+if __name__ == '__main__':
+    main()
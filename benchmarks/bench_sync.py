@@ -0,0 +1,92 @@
+"""
+Database work of a library sync, incremental versus full rewrite.
+
+Stores a synthetic library, then syncs it again unchanged and with a few games
+played, added and removed. Each sync is measured in statements run, bytes
+appended to the write-ahead log and wall time, next to the old approach of
+deleting and reinserting every library_games row and rewriting the whole JSON
+response.
+
+Usage: python benchmarks/bench_sync.py [library size]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import db
+
+def make_library(size, seed=0):
+    rng = random.Random(seed)
+    return [
+        {"appid": appid, "name": f"Game {appid}", "playtime_forever": rng.randint(0, 5000),
+         "rtime_last_played": rng.randint(0, 1_700_000_000)}
+        for appid in range(1, size + 1)
+    ]
+
+def full_rewrite(steam_id, games):
+    # How store_cached_library used to write every sync, JSON response included
+    with db.transaction() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS library_cache "
+            "(steam_id TEXT PRIMARY KEY, fetched_at REAL NOT NULL, games TEXT NOT NULL);"
+        )
+        cursor.execute(
+            "INSERT OR REPLACE INTO library_cache (steam_id, fetched_at, games) VALUES (?, ?, ?);",
+            (steam_id, time.time(), json.dumps(games))
+        )
+        cursor.execute("DELETE FROM library_games WHERE steam_id = ?;", (steam_id,))
+        cursor.executemany(
+            "INSERT INTO library_games (steam_id, appid, name, playtime_forever, rtime_last_played) "
+            "VALUES (?, ?, ?, ?, ?);",
+            [(steam_id, game["appid"], game["name"], game["playtime_forever"], game["rtime_last_played"])
+             for game in games]
+        )
+
+def measure(label, store, steam_id, games):
+    pool = db.get_pool()
+    pool.reset_thread_counters()
+    wal_before = os.path.getsize(db.DB_PATH + '-wal')
+    generation = db.write_generation()
+    start = time.perf_counter()
+    result = store(steam_id, games)
+    seconds = time.perf_counter() - start
+    print(
+        f"{label:>34}: {pool.counters()['statements_run']:6} statements, "
+        f"{(os.path.getsize(db.DB_PATH + '-wal') - wal_before) / 1024:8.1f} KB of WAL, "
+        f"{seconds * 1000:6.1f} ms, caches {'invalidated' if db.write_generation() != generation else 'kept'}"
+    )
+    return result
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+
+    os.chdir(tempfile.mkdtemp())
+    db.initializeDB()
+    # Keep the log growing so its size shows what each sync wrote
+    with db.get_pool().connection() as connection:
+        connection.execute("PRAGMA wal_autocheckpoint = 0;")
+
+    library = make_library(size)
+    played = [dict(game) for game in library[:-5]] + make_library(size + 5)[-5:]
+    for game in played[:20]:
+        game["playtime_forever"] += 30
+
+    db.store_cached_library("incremental", library)
+    measure("incremental, unchanged", db.store_cached_library, "incremental", library)
+    diff = measure("incremental, 20 played, 5 swapped", db.store_cached_library, "incremental", played)
+    print(f"{'':>34}  diff: {len(diff['added'])} added, {len(diff['removed'])} removed, "
+          f"{len(diff['changed'])} changed")
+
+    full_rewrite("full", library)
+    measure("full rewrite, unchanged", full_rewrite, "full", library)
+    measure("full rewrite, 20 played, 5 swapped", full_rewrite, "full", played)
+
+if __name__ == '__main__':
+    main()
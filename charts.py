@@ -0,0 +1,301 @@
+"""
+Chart building for Backlogr's Visual Stats.
+
+By default charts are sent to the browser as Vega-Lite specs built with Altair,
+holding only the few pre-aggregated rows they plot, and the browser draws them.
+Setting BACKLOGR_CHART_BACKEND=matplotlib, or running without Altair installed,
+falls back to rendering PNGs off-screen with Matplotlib's Agg backend; every
+figure is closed as soon as it is saved so long-running servers don't collect
+them. Matplotlib is only imported once the first PNG is rendered, since it is
+the slowest import of the app.
+
+Built specs and rendered PNGs are kept in a bounded LRU cache shared by every
+session and keyed by a hash of the data they show, so an unchanged library costs
+a lookup instead of a build or a render.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import altair as alt
+except ImportError:
+    alt = None
+
+# "altair" for Vega-Lite specs drawn by the browser, "matplotlib" for server-side PNGs
+CHART_BACKEND = os.getenv("BACKLOGR_CHART_BACKEND", "altair")
+if alt is None:
+    CHART_BACKEND = "matplotlib"
+
+# How many built charts are kept across all sessions
+CHART_CACHE_SIZE = 32
+
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+chart_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def _pyplot():
+    # Import pyplot on first use, pinning the non-interactive backend first
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def _content_key(kind, data):
+    # Hash of the chart type and the exact data it is drawn from
+    payload = json.dumps([kind, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _cached(kind, data, build):
+    # Return the cached result of build(data), building it on a miss
+    key = _content_key(kind, data)
+    with _chart_cache_lock:
+        chart = _chart_cache.get(key)
+        if chart is not None:
+            _chart_cache.move_to_end(key)
+            chart_cache_stats['hits'] += 1
+            return chart
+        chart_cache_stats['misses'] += 1
+
+    chart = build(data)
+
+    with _chart_cache_lock:
+        _chart_cache[key] = chart
+        _chart_cache.move_to_end(key)
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return chart
+
+def cached_chart(kind, data, render):
+    """
+    Return the PNG of a chart from the cache, rendering it on a miss.
+
+    Args:
+        kind (str): The type of chart, part of the cache key.
+        data: JSON-serializable data the chart is drawn from, part of the cache key.
+        render (callable): Called with ``data`` to build a Matplotlib figure.
+
+    Returns:
+        bytes: The chart as a PNG.
+    """
+    def to_png(data):
+        plt = _pyplot()
+        fig = render(data)
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png', facecolor=fig.get_facecolor())
+            return buffer.getvalue()
+        finally:
+            plt.close(fig)
+
+    return _cached(kind + ':png', data, to_png)
+
+def cached_spec(kind, data, build):
+    """
+    Return the Vega-Lite spec of a chart from the cache, building it on a miss.
+
+    Args:
+        kind (str): The type of chart, part of the cache key.
+        data: JSON-serializable data the chart is drawn from, part of the cache key.
+        build (callable): Called with ``data`` to build an Altair chart.
+
+    Returns:
+        dict: The validated Vega-Lite spec, ready for ``st.vega_lite_chart``.
+    """
+    return _cached(kind + ':vega-lite', data, lambda data: build(data).to_dict())
+
+def _draw_genre_charts(genre_stats):
+    # genre_stats is a list of (genre, average hours, game count)
+    plt = _pyplot()
+    labels = [genre for genre, _, _ in genre_stats]
+    values = [avg for _, avg, _ in genre_stats]
+    game_counts = [count for _, _, count in genre_stats]
+
+    # Create the visualizations with dark theme
+    with plt.style.context('dark_background'):
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
+
+        # Set figure background color to match website
+        fig.patch.set_facecolor('#1E1E1E')
+        ax1.set_facecolor('#1E1E1E')
+        ax2.set_facecolor('#1E1E1E')
+
+        # Pie chart
+        ax1.pie(
+            values,
+            labels=labels,
+            autopct='%1.1f%%',
+            textprops={'fontsize': 8, 'color': 'white'},
+            colors=plt.cm.Set3.colors
+        )
+        ax1.set_title('Distribution of Average Playtime by Genre', color='white')
+
+        # Bar chart
+        y_pos = np.arange(len(labels))
+
+        ax2.barh(y_pos, values, color=plt.cm.Set3.colors)
+        ax2.set_yticks(y_pos)
+        ax2.set_yticklabels(labels, color='white')
+        ax2.invert_yaxis()
+        ax2.set_xlabel('Average Hours Played', color='white')
+        ax2.set_title('Average Playtime by Genre', color='white')
+
+        # Make axis labels white
+        ax2.tick_params(colors='white')
+        ax2.xaxis.label.set_color('white')
+
+        # Add game count annotations in white
+        for i, v in enumerate(values):
+            ax2.text(v + 1, i, f'({game_counts[i]} games)', va='center', fontsize=8, color='white')
+
+        fig.tight_layout()
+    return fig
+
+def _build_genre_charts(genre_stats):
+    # The same pie and bar charts as Vega-Lite, from one row per genre
+    data = pd.DataFrame(genre_stats, columns=['genre', 'hours', 'games'])
+    data['share'] = data['hours'] / data['hours'].sum()
+    data['label'] = '(' + data['games'].astype(str) + ' games)'
+    order = list(data['genre'])
+    color = alt.Color('genre:N', sort=order, scale=alt.Scale(scheme='set3'), legend=None)
+    tooltip = [
+        alt.Tooltip('genre:N', title='Genre'),
+        alt.Tooltip('hours:Q', title='Average hours', format='.1f'),
+        alt.Tooltip('games:Q', title='Games'),
+    ]
+    base = alt.Chart(data)
+
+    pie = base.encode(theta=alt.Theta('hours:Q', stack=True), color=color, tooltip=tooltip)
+    pie = (
+        pie.mark_arc(outerRadius=140)
+        + pie.mark_text(radius=165, size=11).encode(text='genre:N')
+        + pie.mark_text(radius=100, size=10, color='black').encode(text=alt.Text('share:Q', format='.1%'))
+    ).properties(title='Distribution of Average Playtime by Genre', width=350, height=350)
+
+    y = alt.Y('genre:N', sort=order, title=None)
+    bars = (
+        base.mark_bar().encode(x=alt.X('hours:Q', title='Average Hours Played'), y=y, color=color, tooltip=tooltip)
+        + base.mark_text(align='left', dx=4, size=10).encode(x='hours:Q', y=y, text='label:N')
+    ).properties(title='Average Playtime by Genre', width=450, height=350)
+
+    return alt.hconcat(pie, bars)
+
+def genre_charts(avg_playtime, game_counts):
+    """
+    Build the average playtime by genre pie and bar charts.
+
+    Args:
+        avg_playtime (dict): Genre -> average hours played, in display order.
+        game_counts (dict): Genre -> number of games.
+
+    Returns:
+        dict or bytes: Both charts side by side, as a Vega-Lite spec with the
+        Altair backend or as a PNG with the Matplotlib one.
+    """
+    genre_stats = [
+        (genre, round(avg, 6), game_counts[genre]) for genre, avg in avg_playtime.items()
+    ]
+    if CHART_BACKEND == 'altair':
+        return cached_spec('genre_playtime', genre_stats, _build_genre_charts)
+    return cached_chart('genre_playtime', genre_stats, _draw_genre_charts)
+
+def _draw_playtime_distribution(distribution):
+    # distribution holds bin edges in hours, the histogram counts and the category CDFs
+    plt = _pyplot()
+    edges = np.array(distribution['edges'])
+    counts = distribution['counts']
+
+    with plt.style.context('dark_background'):
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+        fig.patch.set_facecolor('#1E1E1E')
+        ax1.set_facecolor('#1E1E1E')
+        ax2.set_facecolor('#1E1E1E')
+
+        # Histogram, with bars spanning their log-spaced bins
+        ax1.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+                color=plt.cm.Set3.colors[0], edgecolor='#1E1E1E')
+        ax1.set_xscale('log')
+        ax1.set_xlabel('Hours Played', color='white')
+        ax1.set_ylabel('Games', color='white')
+        ax1.set_title('Playtime Distribution', color='white')
+
+        # Cumulative distribution per category
+        for color, (status, cdf) in zip(plt.cm.Set3.colors[2:], distribution['cdfs'].items()):
+            ax2.step(edges, cdf, where='post', label=status, color=color)
+        ax2.set_xscale('log')
+        ax2.set_ylim(0, 1)
+        ax2.set_xlabel('Hours Played', color='white')
+        ax2.set_ylabel('Share of Games Played Less', color='white')
+        ax2.set_title('Cumulative Playtime by Category', color='white')
+        if distribution['cdfs']:
+            ax2.legend()
+        else:
+            ax2.text(0.5, 0.5, 'No categorized games yet', ha='center', va='center',
+                     transform=ax2.transAxes, color='white')
+
+        fig.tight_layout()
+    return fig
+
+def _build_playtime_distribution(distribution):
+    # The same histogram and step CDFs as Vega-Lite, from one row per bin
+    edges = distribution['edges']
+    hours = alt.Scale(type='log')
+    bins = pd.DataFrame({'start': edges[:-1], 'end': edges[1:], 'games': distribution['counts']})
+    histogram = alt.Chart(bins).mark_bar(color='#8DD3C7').encode(
+        x=alt.X('start:Q', scale=hours, title='Hours Played'),
+        x2='end:Q',
+        y=alt.Y('games:Q', title='Games'),
+        tooltip=[
+            alt.Tooltip('start:Q', title='From hours', format='.2f'),
+            alt.Tooltip('end:Q', title='To hours', format='.2f'),
+            alt.Tooltip('games:Q', title='Games'),
+        ],
+    ).properties(title='Playtime Distribution', width=400, height=320)
+
+    shares = pd.DataFrame(
+        [(status, edge, share) for status, cdf in distribution['cdfs'].items() for edge, share in zip(edges, cdf)],
+        columns=['category', 'hours', 'share'],
+    )
+    cdf = alt.Chart(shares).mark_line(interpolate='step-after').encode(
+        x=alt.X('hours:Q', scale=hours, title='Hours Played'),
+        y=alt.Y('share:Q', scale=alt.Scale(domain=[0, 1]), axis=alt.Axis(format='%'),
+                title='Share of Games Played Less'),
+        color=alt.Color('category:N', title='Category'),
+        tooltip=[
+            alt.Tooltip('category:N', title='Category'),
+            alt.Tooltip('hours:Q', title='Hours', format='.2f'),
+            alt.Tooltip('share:Q', title='Share', format='.1%'),
+        ],
+    ).properties(title='Cumulative Playtime by Category', width=400, height=320)
+
+    return alt.hconcat(histogram, cdf)
+
+def playtime_distribution_charts(counts, edges, cdfs):
+    """
+    Build the playtime histogram and per-category cumulative distributions.
+
+    Args:
+        counts (array-like): Games per bin of the histogram.
+        edges (array-like): The bin edges in minutes.
+        cdfs (dict): Category -> share of its games played less than each edge.
+
+    Returns:
+        dict or bytes: Both charts side by side, as a Vega-Lite spec with the
+        Altair backend or as a PNG with the Matplotlib one.
+    """
+    distribution = {
+        'edges': [round(edge / 60, 6) for edge in edges],
+        'counts': [int(count) for count in counts],
+        'cdfs': {status: [round(float(share), 6) for share in cdf] for status, cdf in cdfs.items()},
+    }
+    if CHART_BACKEND == 'altair':
+        return cached_spec('playtime_distribution', distribution, _build_playtime_distribution)
+    return cached_chart('playtime_distribution', distribution, _draw_playtime_distribution)
@@ -0,0 +1,186 @@
+"""
+Command-line entry point for Backlogr batch jobs.
+
+Runs the same database, Steam and genre helpers as the Streamlit app without
+starting it, so library syncs, auto-categorization and stats can be scheduled
+from cron for many accounts at once. Streamlit and Matplotlib are never
+imported, and each command only imports what it uses, so starting up stays cheap.
+
+Usage:
+    python cli.py sync 7656119... 7656119... [--metadata]
+    python cli.py categorize 7656119...
+    python cli.py stats 7656119... [--by status] [--json]
+    python cli.py export 7656119... [--format json] [--output library.csv]
+"""
+
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+import db
+
+
+def _synced_accounts(steam_ids):
+    """
+    Return the given accounts that have a synced library, reporting the others.
+
+    Returns:
+        tuple: (synced steam_ids in the order given, whether any were never synced)
+    """
+    steam_ids = list(dict.fromkeys(steam_ids))
+    sync_times = db.get_library_sync_times(steam_ids)
+    for steam_id in steam_ids:
+        if steam_id not in sync_times:
+            click.echo(f"{steam_id}: never synced, skipping", err=True)
+    return [steam_id for steam_id in steam_ids if steam_id in sync_times], len(sync_times) < len(steam_ids)
+
+@click.group()
+@click.option(
+    "--db", "db_path", envvar="BACKLOGR_DB", default=db.DB_PATH, show_default=True,
+    type=click.Path(dir_okay=False), help="The SQLite database to use.",
+)
+def cli(db_path):
+    """Backlogr batch jobs."""
+    db.DB_PATH = db_path
+    db.initializeDB()
+
+@cli.command()
+@click.argument("steam_ids", nargs=-1, required=True)
+@click.option("--max-age", type=float, default=0, show_default=True,
+              help="Skip accounts synced less than this many seconds ago.")
+@click.option("--workers", type=int, default=4, show_default=True,
+              help="Accounts fetched from Steam at once.")
+@click.option("--metadata/--no-metadata", default=False, show_default=True,
+              help="Also fetch store genres for games that don't have them yet.")
+def sync(steam_ids, max_age, workers, metadata):
+    """Fetch the libraries of STEAM_IDS from Steam and store them."""
+    from steam import sync_library
+
+    now = time.time()
+    sync_times = db.get_library_sync_times(steam_ids)
+    due = []
+    for steam_id in dict.fromkeys(steam_ids):
+        if steam_id in sync_times and now - sync_times[steam_id] < max_age:
+            click.echo(f"{steam_id}: synced {now - sync_times[steam_id]:.0f} s ago, skipping")
+        else:
+            due.append(steam_id)
+
+    failed = []
+    appids = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for steam_id, (games, diff) in zip(due, executor.map(sync_library, due)):
+            if games is None:
+                failed.append(steam_id)
+                click.echo(f"{steam_id}: could not be fetched from Steam", err=True)
+            else:
+                appids.update(game["appid"] for game in games)
+                click.echo(
+                    f"{steam_id}: {len(games)} games, {len(diff['added'])} added, "
+                    f"{len(diff['removed'])} removed, {len(diff['changed'])} changed "
+                    f"(+{sum(diff['playtime_deltas'].values()) / 60:.1f} hours played)"
+                )
+
+    if metadata and appids:
+        from store_metadata import fetch_missing_metadata
+        click.echo(f"Fetched store genres for {fetch_missing_metadata(appids)} games")
+    if failed:
+        sys.exit(1)
+
+@cli.command()
+@click.argument("steam_ids", nargs=-1, required=True)
+def categorize(steam_ids):
+    """
+    Categorize and classify the synced libraries of STEAM_IDS.
+
+    Unplayed games that aren't in a category yet are put in Not Played, as the
+    Library Menu does, and games without an up to date genre are classified.
+    Exits with status 1 if any account was never synced.
+    """
+    from genres import classify_library
+
+    synced, missing = _synced_accounts(steam_ids)
+    for steam_id in synced:
+        games = db.get_cached_library(steam_id)[0]
+        db.resolve_appids(steam_id)
+        categorized = db.get_game_categories()
+        added = db.add_notplayed_many([
+            (game["appid"], game["name"]) for game in games
+            if game["playtime_forever"] == 0 and game["appid"] not in categorized
+        ])
+        classified = classify_library(steam_id)
+        click.echo(f"{steam_id}: {added} games added to Not Played, {classified} genres classified")
+    if missing:
+        sys.exit(1)
+
+@cli.command()
+@click.argument("steam_ids", nargs=-1, required=True)
+@click.option("--by", type=click.Choice(["genre", "status"]), default="genre", show_default=True,
+              help="What to group playtime by.")
+@click.option("--merge", is_flag=True, help="Count games owned by several accounts once.")
+@click.option("--json", "as_json", is_flag=True, help="Print JSON instead of a table.")
+def stats(steam_ids, by, merge, as_json):
+    """
+    Print playtime statistics of the synced libraries of STEAM_IDS.
+
+    Exits with status 1 if any account was never synced.
+    """
+    from stats import group_summary, load_library_frame, merge_accounts
+
+    synced, missing = _synced_accounts(steam_ids)
+    frame = load_library_frame(synced)
+    if merge:
+        frame = merge_accounts(frame)
+    summary = group_summary(frame, by=by)
+    counts = summary.pop('count')
+    # Minutes to hours
+    hours = summary / 60
+
+    if as_json:
+        click.echo(json.dumps({
+            str(group): {
+                'games': int(counts[group]),
+                **{column: round(float(value), 2) for column, value in row.items()},
+            }
+            for group, row in hours.iterrows()
+        }, indent=2))
+    else:
+        click.echo(f"{len(frame)} games, {frame['playtime_forever'].sum() / 60:.1f} hours played")
+        click.echo(f"{by.capitalize():<12}{'games':>7}{'hours':>10}{'mean':>8}{'median':>8}{'p90':>8}")
+        for group, row in hours.iterrows():
+            click.echo(
+                f"{str(group):<12}{counts[group]:>7}{row['sum']:>10.1f}{row['mean']:>8.1f}"
+                f"{row['median']:>8.1f}{row['p90']:>8.1f}"
+            )
+    if missing:
+        sys.exit(1)
+
+@cli.command()
+@click.argument("steam_ids", nargs=-1, required=True)
+@click.option("--format", "output_format", type=click.Choice(["csv", "json"]), default="csv",
+              show_default=True)
+@click.option("--output", type=click.File("w"), default="-", help="File to write, stdout by default.")
+def export(steam_ids, output_format, output):
+    """
+    Export the synced libraries of STEAM_IDS with their categories and ratings.
+
+    Exits with status 1 if any account was never synced.
+    """
+    synced, missing = _synced_accounts(steam_ids)
+    rows = db.get_library_rows(synced)
+    if output_format == "json":
+        json.dump([dict(zip(db.LIBRARY_ROW_COLUMNS, row)) for row in rows], output, indent=2)
+        output.write("\n")
+    else:
+        writer = csv.writer(output)
+        writer.writerow(db.LIBRARY_ROW_COLUMNS)
+        writer.writerows(rows)
+    click.echo(f"Exported {len(rows)} games", err=True)
+    if missing:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    cli()
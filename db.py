@@ -0,0 +1,793 @@
+"""
+Database layer for Backlogr.
+
+Streamlit re-executes backlogr.py on every interaction, but imported modules are
+only loaded once per process, so the connection pool defined here outlives reruns.
+Connections are opened in WAL mode with a relaxed ``synchronous`` level and a
+large prepared statement cache, then handed out and returned by ``connection()``.
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = './peyton.db'
+
+# How many idle connections the pool keeps around for reuse
+POOL_SIZE = 4
+# How many prepared statements each connection keeps compiled
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionPool:
+    """
+    A small pool of SQLite connections shared by every thread in the process.
+
+    Each borrowed connection is used by one thread at a time, so connections are
+    opened with ``check_same_thread=False`` and can move between script threads.
+    Statements are counted through a trace callback, both for the whole process
+    and for the current thread (one Streamlit rerun runs on one thread).
+    """
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.connections_opened = 0
+        self.statements_run = 0
+
+    def _count_statement(self, statement):
+        with self._lock:
+            self.statements_run += 1
+        self._local.statements = getattr(self._local, 'statements', 0) + 1
+
+    def _open(self):
+        connection = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        connection.execute("PRAGMA journal_mode=WAL;")
+        # NORMAL is durable in WAL mode except for the last commits on power loss
+        connection.execute("PRAGMA synchronous=NORMAL;")
+        connection.execute("PRAGMA foreign_keys=ON;")
+        connection.set_trace_callback(self._count_statement)
+        with self._lock:
+            self.connections_opened += 1
+        self._local.connections = getattr(self._local, 'connections', 0) + 1
+        return connection
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection from the pool, opening a new one if none are idle."""
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._open()
+        try:
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.rollback()
+            try:
+                self._idle.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+    def reset_thread_counters(self):
+        """Start counting connections and statements for the current thread from zero."""
+        self._local.connections = 0
+        self._local.statements = 0
+
+    def counters(self):
+        """Return connection and statement counters for this thread and the process."""
+        return {
+            'connections_opened': getattr(self._local, 'connections', 0),
+            'statements_run': getattr(self._local, 'statements', 0),
+            'total_connections_opened': self.connections_opened,
+            'total_statements_run': self.statements_run,
+        }
+
+    def close_all(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Bumped after every committed transaction that changed rows, so caches of query
+# results know they are stale
+_write_generation = 0
+_write_generation_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # DB_PATH is read here so it can be changed before first use
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+@contextmanager
+def transaction(invalidates=True):
+    """
+    Borrow a pooled connection and commit on success or roll back on error.
+
+    Args:
+        invalidates (bool): Whether changed rows bump the write generation. Only
+            pass False for writes no cached query result depends on.
+    """
+    global _write_generation
+    with get_pool().connection() as connection:
+        changes_before = connection.total_changes
+        with connection:
+            yield connection
+        changed = connection.total_changes != changes_before
+    if changed and invalidates:
+        with _write_generation_lock:
+            _write_generation += 1
+
+def write_generation():
+    """Return a number that changes whenever this process commits changed rows."""
+    return _write_generation
+
+
+# Categories a game in the games table can be in
+GAME_STATUSES = ('Completed', 'Playing', 'Not Played')
+
+# Bumped whenever initializeDB has a new migration step to run
+SCHEMA_VERSION = 1
+
+# Per-platform playtime fields of a GetOwnedGames game, stored as library_games columns
+PLATFORM_PLAYTIME_COLUMNS = (
+    'playtime_windows_forever', 'playtime_mac_forever', 'playtime_linux_forever',
+    'playtime_deck_forever',
+)
+
+
+# Database Code: Initializes the database and defines methods to interact with it
+def initializeDB():
+    """
+    Create the games and Reviews tables and migrate older databases.
+
+    Games are stored once in a single table keyed by Steam appid, with their
+    category in an indexed status column and the 100% / On Hold flags alongside.
+    Databases written before that used one table per category keyed by name;
+    those are migrated once, tracked through ``PRAGMA user_version``.
+    """
+    with transaction() as connection:
+        cursor = connection.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS games (
+                appid INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                status TEXT NOT NULL CHECK (status IN ('Completed', 'Playing', 'Not Played')),
+                hundredpercent INTEGER NOT NULL DEFAULT 0,
+                hold INTEGER NOT NULL DEFAULT 0
+            );
+        ''')
+        # Covers counting games per category and listing one category
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_games_category ON games (status, hundredpercent, hold);"
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_games_name ON games (name);")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS Reviews (
+                name TEXT PRIMARY KEY,
+                review INTEGER NOT NULL
+            );
+        ''')
+        # Store genres and categories per app, as JSON lists of descriptions
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS app_metadata (
+                appid INTEGER PRIMARY KEY,
+                genres TEXT NOT NULL,
+                categories TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+        ''')
+        # When each Steam account's library was last synced, and which sync
+        # migrated games were last matched against
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS library_syncs (
+                steam_id TEXT PRIMARY KEY,
+                fetched_at REAL NOT NULL,
+                appids_resolved_at REAL
+            );
+        ''')
+        # The last synced libraries one row per game, so they can be diffed, joined and aggregated
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS library_games (
+                steam_id TEXT NOT NULL,
+                appid INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                playtime_forever INTEGER NOT NULL,
+                rtime_last_played INTEGER NOT NULL DEFAULT 0,
+                playtime_windows_forever INTEGER NOT NULL DEFAULT 0,
+                playtime_mac_forever INTEGER NOT NULL DEFAULT 0,
+                playtime_linux_forever INTEGER NOT NULL DEFAULT 0,
+                playtime_deck_forever INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (steam_id, appid)
+            );
+        ''')
+        # Logged-in browser sessions, by a hash of the token the browser holds
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS login_sessions (
+                token_hash TEXT PRIMARY KEY,
+                steam_id TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        ''')
+        # Genre of each app and the classifier version that chose it
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS game_genres (
+                appid INTEGER PRIMARY KEY,
+                genre TEXT NOT NULL,
+                classifier_version INTEGER NOT NULL
+            );
+        ''')
+
+        version = cursor.execute("PRAGMA user_version;").fetchone()[0]
+        if version < 1:
+            _migrate_category_tables(cursor)
+        if version < SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+def _migrate_category_tables(cursor):
+    """
+    Copy games from the old Completed, Playing and NotPlayed tables into games.
+
+    The old tables only stored names, so migrated games get a provisional negative
+    appid until ``resolve_appids`` matches them against the Steam library. A name
+    that appears in several old tables keeps its first category in the order
+    Completed, Playing, Not Played.
+    """
+    legacy_tables = {
+        row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name IN ('Completed', 'Playing', 'NotPlayed');"
+        )
+    }
+    rows = {}
+    if 'Completed' in legacy_tables:
+        for name, hundred, hold in cursor.execute(
+            "SELECT name, hundredpercent, hold FROM Completed;"
+        ).fetchall():
+            rows.setdefault(name, ('Completed', hundred == "Yes", hold == "Yes"))
+    if 'Playing' in legacy_tables:
+        for (name,) in cursor.execute("SELECT name FROM Playing;").fetchall():
+            rows.setdefault(name, ('Playing', False, False))
+    if 'NotPlayed' in legacy_tables:
+        for (name,) in cursor.execute("SELECT name FROM NotPlayed;").fetchall():
+            rows.setdefault(name, ('Not Played', False, False))
+
+    cursor.executemany(
+        "INSERT INTO games (appid, name, status, hundredpercent, hold) VALUES (?, ?, ?, ?, ?);",
+        [
+            (-index, name, status, hundred, hold)
+            for index, (name, (status, hundred, hold)) in enumerate(rows.items(), start=1)
+        ]
+    )
+    for table_name in legacy_tables:
+        cursor.execute(f"DROP TABLE {table_name};")
+
+def resolve_appids(steam_id):
+    """
+    Give games migrated from the old name-keyed tables their real Steam appid.
+
+    Games are matched by name against an account's synced library, once per
+    sync. Names that don't match, for renamed or delisted games or names whose
+    appid is already taken, are not tried again until the library syncs again.
+
+    Args:
+        steam_id (str): The Steam account whose synced library to match against.
+
+    Returns:
+        int: How many games were matched to an appid.
+    """
+    with get_pool().connection() as connection:
+        # The primary key index makes this a cheap range probe
+        if connection.execute("SELECT 1 FROM games WHERE appid < 0 LIMIT 1;").fetchone() is None:
+            return 0
+        synced = connection.execute(
+            "SELECT fetched_at, appids_resolved_at FROM library_syncs WHERE steam_id = ?;",
+            (steam_id,)
+        ).fetchone()
+    if synced is None or synced[1] == synced[0]:
+        return 0
+    with transaction() as connection:
+        cursor = connection.execute(
+            """
+            UPDATE OR IGNORE games SET appid = (
+                SELECT appid FROM library_games
+                WHERE steam_id = ? AND library_games.name = games.name LIMIT 1
+            )
+            WHERE appid < 0 AND name IN (SELECT name FROM library_games WHERE steam_id = ?);
+            """,
+            (steam_id, steam_id)
+        )
+        resolved = cursor.rowcount
+    # Remembering the pass changes no cached query result
+    with transaction(invalidates=False) as connection:
+        connection.execute(
+            "UPDATE library_syncs SET appids_resolved_at = ? WHERE steam_id = ?;",
+            (synced[0], steam_id)
+        )
+    return resolved
+
+def get_category_counts():
+    """
+    Count the categorized games per (status, hundredpercent, hold) combination.
+
+    Returns:
+        dict: (status, hundredpercent, hold) -> number of games.
+    """
+    with get_pool().connection() as connection:
+        result = connection.execute(
+            "SELECT status, hundredpercent, hold, COUNT(*) FROM games "
+            "GROUP BY status, hundredpercent, hold;"
+        ).fetchall()
+    return {(r[0], r[1], r[2]): r[3] for r in result}
+
+def get_category_page(status, hundred, hold, limit, offset=0):
+    """
+    Return one page of the games in a category, with their ratings.
+
+    Returns:
+        list: (name, rating) tuples ordered by name, with rating 0 for unrated games.
+    """
+    with get_pool().connection() as connection:
+        return connection.execute(
+            """
+            SELECT g.name, COALESCE(r.review, 0)
+            FROM games AS g
+            LEFT JOIN Reviews AS r ON r.name = g.name
+            WHERE g.status = ? AND g.hundredpercent = ? AND g.hold = ?
+            ORDER BY g.name COLLATE NOCASE
+            LIMIT ? OFFSET ?;
+            """,
+            (status, hundred, hold, limit, offset)
+        ).fetchall()
+
+def get_game_categories():
+    # Return appid -> (status, hundredpercent, hold) for every categorized game
+    with get_pool().connection() as connection:
+        result = connection.execute("SELECT appid, status, hundredpercent, hold FROM games;").fetchall()
+    return {r[0]: (r[1], r[2], r[3]) for r in result}
+
+def get_reviews():
+    # Fetch all reviews from the Reviews table
+    with get_pool().connection() as connection:
+        result = connection.execute("SELECT name, review FROM Reviews;").fetchall()
+    return {r[0]: r[1] for r in result}  # Convert to dictionary with game names as keys
+
+def move_game(name_or_appid, new_status, hundred=False, hold=False, name=None):
+    """
+    Put a game in a category, moving it out of any category it was in before.
+
+    The move is a single statement, so it is atomic, and the game's review is kept.
+
+    Args:
+        name_or_appid (int or str): The Steam appid of the game, or its name.
+        new_status (str): One of GAME_STATUSES.
+        hundred (bool): Whether the game was completed 100%.
+        hold (bool): Whether the game is on hold.
+        name (str): The name to store for a game given by appid that isn't
+            categorized yet, defaulting to its name in the cached libraries.
+
+    Returns:
+        bool: True if the game was moved, False if it could not be found.
+    """
+    if new_status not in GAME_STATUSES:
+        raise ValueError(f"Invalid status: {new_status}")
+    with transaction() as connection:
+        if isinstance(name_or_appid, int):
+            cursor = connection.execute(
+                """
+                INSERT INTO games (appid, name, status, hundredpercent, hold)
+                SELECT :appid, name, :status, :hundred, :hold FROM (
+                    SELECT COALESCE(
+                        :name,
+                        (SELECT name FROM games WHERE appid = :appid),
+                        (SELECT name FROM library_games WHERE appid = :appid LIMIT 1)
+                    ) AS name
+                )
+                WHERE name IS NOT NULL
+                ON CONFLICT (appid) DO UPDATE SET
+                    status = excluded.status,
+                    hundredpercent = excluded.hundredpercent,
+                    hold = excluded.hold;
+                """,
+                {"appid": name_or_appid, "name": name, "status": new_status,
+                 "hundred": hundred, "hold": hold}
+            )
+        else:
+            cursor = connection.execute(
+                """
+                INSERT INTO games (appid, name, status, hundredpercent, hold)
+                SELECT appid, name, :status, :hundred, :hold FROM (
+                    SELECT appid, name FROM games WHERE name = :name
+                    UNION ALL
+                    SELECT appid, name FROM library_games WHERE name = :name
+                    LIMIT 1
+                )
+                WHERE true
+                ON CONFLICT (appid) DO UPDATE SET
+                    status = excluded.status,
+                    hundredpercent = excluded.hundredpercent,
+                    hold = excluded.hold;
+                """,
+                {"name": name_or_appid, "status": new_status, "hundred": hundred, "hold": hold}
+            )
+        return cursor.rowcount > 0
+
+def set_statuses(changes):
+    """
+    Put many games in categories in one transaction.
+
+    Args:
+        changes (list): (appid, name, status, hundred, hold) tuples.
+
+    Returns:
+        int: How many games were written.
+    """
+    for change in changes:
+        if change[2] not in GAME_STATUSES:
+            raise ValueError(f"Invalid status: {change[2]}")
+    with transaction() as connection:
+        cursor = connection.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO games (appid, name, status, hundredpercent, hold) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (appid) DO UPDATE SET
+                name = excluded.name,
+                status = excluded.status,
+                hundredpercent = excluded.hundredpercent,
+                hold = excluded.hold;
+            """,
+            changes
+        )
+        return cursor.rowcount
+
+def add_notplayed_many(games):
+    """
+    Add many games to Not Played in one transaction.
+
+    Games that are already categorized keep their category.
+
+    Args:
+        games (list): (appid, name) pairs.
+
+    Returns:
+        int: How many games were added.
+    """
+    if not games:
+        return 0
+    with transaction() as connection:
+        cursor = connection.cursor()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO games (appid, name, status) VALUES (?, ?, 'Not Played');",
+            games
+        )
+        return cursor.rowcount
+
+def store_reviews(reviews):
+    """
+    Save many ratings in one transaction.
+
+    Args:
+        reviews (dict): Game name -> rating.
+
+    Returns:
+        int: How many ratings were written.
+    """
+    with transaction() as connection:
+        connection.executemany(
+            """
+            INSERT INTO Reviews (name, review) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET review = excluded.review;
+            """,
+            list(reviews.items())
+        )
+    return len(reviews)
+
+# Function to remove a game from a specific category
+def remove_game(status, game_name):
+    """
+    Remove a game from a specified category.
+    Returns True if successful, False otherwise.
+    """
+    if status not in GAME_STATUSES:
+        print(f"Invalid status: {status}")
+        return False
+
+    try:
+        with transaction() as connection:
+            cursor = connection.cursor()
+
+            # Delete the game
+            cursor.execute("DELETE FROM games WHERE name = ? AND status = ?;", (game_name, status))
+            if cursor.rowcount == 0:
+                return False
+
+            # Also remove from Reviews if it exists there
+            cursor.execute("DELETE FROM Reviews WHERE name = ?", (game_name,))
+            return True
+
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
+
+# Columns of library_games compared between syncs, after steam_id and appid
+_LIBRARY_GAME_COLUMNS = ('name', 'playtime_forever', 'rtime_last_played') + PLATFORM_PLAYTIME_COLUMNS
+
+def get_cached_library(steam_id):
+    """
+    Return the last synced Steam library of an account.
+
+    Returns:
+        tuple: (games, fetched_at) where games are dicts with the fields of a
+        GetOwnedGames game that are stored, and fetched_at is a Unix timestamp,
+        or None if the library was never synced.
+    """
+    with get_pool().connection() as connection:
+        synced = connection.execute(
+            "SELECT fetched_at FROM library_syncs WHERE steam_id = ?;", (steam_id,)
+        ).fetchone()
+        if synced is None:
+            return None
+        rows = connection.execute(
+            f"SELECT appid, {', '.join(_LIBRARY_GAME_COLUMNS)} FROM library_games WHERE steam_id = ?;",
+            (steam_id,)
+        ).fetchall()
+    fields = ('appid',) + _LIBRARY_GAME_COLUMNS
+    return [dict(zip(fields, row)) for row in rows], synced[0]
+
+def get_library_sync_times(steam_ids):
+    """
+    Return when each of the given accounts' libraries was last synced.
+
+    Returns:
+        dict: steam_id -> Unix timestamp, leaving out accounts never synced.
+    """
+    steam_ids = list(steam_ids)
+    with get_pool().connection() as connection:
+        rows = connection.execute(
+            f"SELECT steam_id, fetched_at FROM library_syncs "
+            f"WHERE steam_id IN ({', '.join('?' * len(steam_ids))});",
+            steam_ids
+        ).fetchall()
+    return dict(rows)
+
+def _sync_library_games(cursor, steam_id, games):
+    """
+    Bring the per-game rows of an account's library up to date with a new response.
+
+    Only games that were added, removed or changed since the rows were written
+    are touched, so an unchanged library is synced without writing anything.
+
+    Returns:
+        dict: The appids that were ``added``, ``removed`` and ``changed``, and
+        ``playtime_deltas`` mapping each changed appid to the minutes played since.
+    """
+    stored = {
+        row[0]: row[1:] for row in cursor.execute(
+            f"SELECT appid, {', '.join(_LIBRARY_GAME_COLUMNS)} FROM library_games WHERE steam_id = ?;",
+            (steam_id,)
+        )
+    }
+    latest = {
+        game["appid"]: (game.get("name", ""), game.get("playtime_forever", 0), game.get("rtime_last_played", 0))
+        + tuple(game.get(column, 0) for column in PLATFORM_PLAYTIME_COLUMNS)
+        for game in games
+    }
+    added = [appid for appid in latest if appid not in stored]
+    removed = [appid for appid in stored if appid not in latest]
+    changed = [appid for appid, row in latest.items() if appid in stored and stored[appid] != row]
+
+    if removed:
+        cursor.executemany(
+            "DELETE FROM library_games WHERE steam_id = ? AND appid = ?;",
+            [(steam_id, appid) for appid in removed]
+        )
+    if added or changed:
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO library_games (steam_id, appid, {', '.join(_LIBRARY_GAME_COLUMNS)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(_LIBRARY_GAME_COLUMNS))});",
+            [(steam_id, appid) + latest[appid] for appid in added + changed]
+        )
+    return {
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "playtime_deltas": {appid: latest[appid][1] - stored[appid][1] for appid in changed},
+    }
+
+def store_cached_library(steam_id, games, fetched_at=None):
+    """
+    Store the latest Steam library of an account, writing only what changed.
+
+    Args:
+        steam_id (str): The Steam account.
+        games (list): Games as returned by the Steam GetOwnedGames endpoint.
+        fetched_at (float): When they were fetched, defaults to now.
+
+    Returns:
+        dict: What changed since the last sync, as returned by ``_sync_library_games``.
+    """
+    if fetched_at is None:
+        fetched_at = time.time()
+    with transaction() as connection:
+        diff = _sync_library_games(connection.cursor(), steam_id, games)
+    # The sync time alone changes no cached query result
+    with transaction(invalidates=False) as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO library_syncs (steam_id, fetched_at) VALUES (?, ?);",
+            (steam_id, fetched_at)
+        )
+    return diff
+
+def store_login_session(token_hash, steam_id, expires_at):
+    """
+    Save a logged-in session, dropping sessions that have expired.
+
+    Args:
+        token_hash (str): Hash of the session token the browser holds.
+        steam_id (str): The Steam account that logged in.
+        expires_at (float): Unix timestamp after which the session is no longer valid.
+    """
+    # Sessions change no cached query result
+    with transaction(invalidates=False) as connection:
+        connection.execute("DELETE FROM login_sessions WHERE expires_at < ?;", (time.time(),))
+        connection.execute(
+            "INSERT OR REPLACE INTO login_sessions (token_hash, steam_id, expires_at) VALUES (?, ?, ?);",
+            (token_hash, steam_id, expires_at)
+        )
+
+def rotate_login_session(token_hash, new_token_hash, expires_at):
+    """
+    Swap a logged-in session's token for a new one, so the old token stops working.
+
+    Args:
+        token_hash (str): Hash of the token the browser presented.
+        new_token_hash (str): Hash of the token that replaces it.
+        expires_at (float): Unix timestamp after which the new token is no longer valid.
+
+    Returns:
+        str: The Steam ID of the session, or None if there is no such session or it expired.
+    """
+    with transaction(invalidates=False) as connection:
+        row = connection.execute(
+            "SELECT steam_id FROM login_sessions WHERE token_hash = ? AND expires_at >= ?;",
+            (token_hash, time.time())
+        ).fetchone()
+        connection.execute("DELETE FROM login_sessions WHERE token_hash = ?;", (token_hash,))
+        if row is None:
+            return None
+        connection.execute(
+            "INSERT INTO login_sessions (token_hash, steam_id, expires_at) VALUES (?, ?, ?);",
+            (new_token_hash, row[0], expires_at)
+        )
+    return row[0]
+
+def delete_login_session(token_hash):
+    # End a logged-in session, for example on logout
+    with transaction(invalidates=False) as connection:
+        connection.execute("DELETE FROM login_sessions WHERE token_hash = ?;", (token_hash,))
+
+def get_appids_with_metadata():
+    # Return the appids whose store metadata has already been fetched
+    with get_pool().connection() as connection:
+        result = connection.execute("SELECT appid FROM app_metadata;").fetchall()
+    return {r[0] for r in result}
+
+def store_app_metadata(metadata):
+    """
+    Save store metadata for many apps in one transaction.
+
+    Args:
+        metadata (dict): appid -> {"genres": [...], "categories": [...]}
+    """
+    fetched_at = time.time()
+    with transaction() as connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO app_metadata (appid, genres, categories, fetched_at) "
+            "VALUES (?, ?, ?, ?);",
+            [
+                (appid, json.dumps(details["genres"]), json.dumps(details["categories"]), fetched_at)
+                for appid, details in metadata.items()
+            ]
+        )
+        # Genres guessed from names are stale once the real ones are known
+        connection.executemany(
+            "DELETE FROM game_genres WHERE appid = ?;", [(appid,) for appid in metadata]
+        )
+
+def get_unclassified_games(steam_id, classifier_version):
+    """
+    Return the games of a library that need their genre (re)classified.
+
+    That is games never classified, or classified by an older classifier version.
+
+    Returns:
+        list: (appid, name, store genres) tuples, with store genres None if unknown.
+    """
+    with get_pool().connection() as connection:
+        result = connection.execute(
+            """
+            SELECT l.appid, l.name, m.genres
+            FROM library_games AS l
+            LEFT JOIN game_genres AS g ON g.appid = l.appid
+            LEFT JOIN app_metadata AS m ON m.appid = l.appid
+            WHERE l.steam_id = ? AND (g.appid IS NULL OR g.classifier_version < ?);
+            """,
+            (steam_id, classifier_version)
+        ).fetchall()
+    return [
+        (appid, name, json.loads(genres) if genres is not None else None)
+        for appid, name, genres in result
+    ]
+
+def store_genre_classifications(genres, classifier_version):
+    """
+    Save the genre of many apps in one transaction.
+
+    Args:
+        genres (dict): appid -> genre.
+        classifier_version (int): The version of the classifier that chose them.
+    """
+    with transaction() as connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO game_genres (appid, genre, classifier_version) VALUES (?, ?, ?);",
+            [(appid, genre, classifier_version) for appid, genre in genres.items()]
+        )
+
+# Columns of the rows returned by get_library_rows
+LIBRARY_ROW_COLUMNS = (
+    ('steam_id', 'appid', 'name', 'playtime_forever', 'rtime_last_played')
+    + PLATFORM_PLAYTIME_COLUMNS
+    + ('genre', 'status', 'hundredpercent', 'hold', 'rating')
+)
+
+def get_library_rows(steam_ids):
+    """
+    Return every game of one or more libraries with its genre, category and rating.
+
+    Args:
+        steam_ids (iterable): The Steam accounts whose libraries to load.
+
+    Returns:
+        list: Tuples in the order of LIBRARY_ROW_COLUMNS, with None for the genre and
+        category of games that have none and for ratings of unrated games.
+    """
+    steam_ids = list(steam_ids)
+    if not steam_ids:
+        return []
+    placeholders = ", ".join("?" * len(steam_ids))
+    with get_pool().connection() as connection:
+        return connection.execute(
+            f"""
+            SELECT l.steam_id, l.appid, l.name, l.playtime_forever, l.rtime_last_played,
+                   {", ".join("l." + column for column in PLATFORM_PLAYTIME_COLUMNS)},
+                   gg.genre, g.status, COALESCE(g.hundredpercent, 0), COALESCE(g.hold, 0), r.review
+            FROM library_games AS l
+            LEFT JOIN game_genres AS gg ON gg.appid = l.appid
+            LEFT JOIN games AS g ON g.appid = l.appid
+            LEFT JOIN Reviews AS r ON r.name = g.name
+            WHERE l.steam_id IN ({placeholders});
+            """,
+            steam_ids
+        ).fetchall()
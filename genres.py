@@ -0,0 +1,159 @@
+"""
+Genre classification for Backlogr.
+
+Games are grouped under their real store genre when it is known, and otherwise
+guessed from their name. Each guessed genre has a set of keywords, and a game
+belongs to the first genre in GENRES with a keyword anywhere in its lowercased
+name. All keyword sets are compiled once, at import, into one prefix-factored
+regular expression that finds the best genre in a single pass over the name.
+
+Classifications are stored per appid along with CLASSIFIER_VERSION, so only new
+games, games whose store genres just arrived, and games classified by an older
+version are ever classified again.
+"""
+
+import re
+
+from db import get_unclassified_games, store_genre_classifications
+
+# Bump whenever the keywords or the store genre mapping change, to reclassify every game
+CLASSIFIER_VERSION = 1
+
+# Expanded keyword lists for better genre detection
+action_keywords = {'action', 'shooter', 'fps', 'fight', 'combat', 'battle', 'warfare', 'war', 'dead', 'doom',
+                   'counter', 'strike', 'call of duty', 'battlefield', 'halo', 'metal gear', 'sleeping dogs', 'turok',
+                   'resident evil', 'hitman', 'portal', 'borderlands', 'space marine', 'wukong', 'sekiro', 'metro', 'max payne', 'half-life'}
+
+adventure_keywords = {'adventure', 'quest', 'journey', 'exploration', 'tomb raider', 'uncharted', 's.t.a.l.k.e.r.', 'red dead redemption',
+                      'assassin', 'walking', 'life is strange', 'telltale', 'story', 'tsushima', 'last of us', 'dying light', }
+
+rpg_keywords = {'rpg', 'role', 'fantasy', 'witcher', 'elder scrolls', 'fallout', 'final fantasy',
+                'mass effect', 'dragon', 'souls', 'persona', 'dark souls', 'skyrim', 'diablo', 'chrono trigger', # goated game
+                'kingdom', 'divinity', 'baldur', 'deus ex', 'elden', 'path of exile', 'dragon', 'cyberpunk'}
+
+strategy_keywords = {'strategy', 'tactic', 'command', 'civilization', 'total war', 'hearts of iron',
+                     'crusader kings', 'age of empires', 'starcraft', 'dawn of war', 'xcom', 'stellaris',
+                     'city builder', 'management', 'defense', 'tower'}
+
+simulation_keywords = {'simulation', 'simulator', 'tycoon', 'farm', 'euro truck', 'flight', 'sims',
+                       'cities:', 'city:', 'planet', 'zoo', 'hospital', 'cooking', 'fishing', 'train',
+                       'building', 'construction'}
+
+sports_keywords = {'sports', 'football', 'soccer', 'basketball', 'nba', 'fifa', 'baseball', 'racing',
+                   'race', 'car', 'drift', 'rally', 'forza', 'need for speed', 'dirt', 'golf', 'tennis',
+                   'skateboard', 'skate', 'tony hawk', 'motorsport', 'rugby', 'hockey'}
+
+indie_keywords = {'indie', 'pixel', 'roguelike', 'rogue', 'platformer', 'puzzle', 'stardew', 'terraria',
+                  'minecraft', 'undertale', 'hollow knight', 'binding of isaac', 'inside', 'limbo',
+                  'celeste', 'hades', "don't starve", 'castle crashers', 'balatro'}
+
+# Genres in order of precedence, with the keywords that select them
+GENRE_KEYWORDS = (
+    ('Action', action_keywords),
+    ('Adventure', adventure_keywords),
+    ('RPG', rpg_keywords),
+    ('Strategy', strategy_keywords),
+    ('Simulation', simulation_keywords),
+    ('Sports', sports_keywords),
+    ('Indie', indie_keywords),
+)
+# Every genre a game can be grouped under, including the catch-all
+GENRES = tuple(genre for genre, _ in GENRE_KEYWORDS) + ('Other',)
+
+# Visual Stats genre for each storefront genre, checked in this order
+STORE_GENRE_BUCKETS = (
+    ('Action', 'Action'),
+    ('Adventure', 'Adventure'),
+    ('RPG', 'RPG'),
+    ('Strategy', 'Strategy'),
+    ('Simulation', 'Simulation'),
+    ('Sports', 'Sports'),
+    ('Racing', 'Sports'),
+    ('Indie', 'Indie'),
+)
+
+def _trie_pattern(words):
+    """Build a regex alternation of words with their common prefixes factored out."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = '(?:' + '|'.join(branches) + ')'
+        # A word ending here makes the rest of the branch optional
+        return pattern + '?' if '' in node else pattern
+
+    return emit(trie)
+
+# Precedence of the best genre each keyword selects
+_keyword_rank = {}
+for rank, (_, keywords) in enumerate(GENRE_KEYWORDS):
+    for keyword in keywords:
+        _keyword_rank.setdefault(keyword, rank)
+
+# Every keyword that matches at some position of a name is a prefix of the longest
+# one matching there, so the longest keyword stands for the best rank among them
+_longest_match_rank = {
+    keyword: min(rank for other, rank in _keyword_rank.items() if keyword.startswith(other))
+    for keyword in _keyword_rank
+}
+
+# All keywords as one prefix-factored alternation inside a lookahead, so every
+# position of the name is tried and overlapping keywords can't hide each other
+_KEYWORD_PATTERN = re.compile('(?=(' + _trie_pattern(_keyword_rank) + '))')
+
+def classify_genre(name):
+    """
+    Guess the genre of a game from its name.
+
+    Args:
+        name (str): The name of the game.
+
+    Returns:
+        str: One of GENRES.
+    """
+    best = len(GENRE_KEYWORDS)
+    for match in _KEYWORD_PATTERN.finditer(name.lower()):
+        rank = _longest_match_rank[match.group(1)]
+        if rank < best:
+            best = rank
+            if best == 0:
+                break
+    return GENRES[best]
+
+def store_genre_bucket(genres):
+    """
+    Map storefront genres to the single genre Visual Stats groups a game under.
+
+    Returns:
+        str: The Visual Stats genre, or None if none of the genres map to one.
+    """
+    for store_genre, bucket in STORE_GENRE_BUCKETS:
+        if store_genre in genres:
+            return bucket
+    return None
+
+def classify_game(name, store_genres=None):
+    # Use the store genres if they map to a genre, otherwise guess from the name
+    return (store_genres and store_genre_bucket(store_genres)) or classify_genre(name)
+
+def classify_library(steam_id):
+    """
+    Classify the games of a library that have no up to date genre yet.
+
+    Returns:
+        int: How many games were classified.
+    """
+    genres = {
+        appid: classify_game(name, store_genres)
+        for appid, name, store_genres in get_unclassified_games(steam_id, CLASSIFIER_VERSION)
+    }
+    if genres:
+        store_genre_classifications(genres, CLASSIFIER_VERSION)
+    return len(genres)
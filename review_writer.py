@@ -0,0 +1,163 @@
+"""
+Write-behind queue for Backlogr's review ratings.
+
+Dragging a rating slider sends a change for every step it passes, and each one
+used to be its own transaction on the script thread. Ratings are queued by game
+name instead, so only the last rating of a game within REVIEW_FLUSH_DELAY seconds
+is kept, and a background thread writes everything queued in one transaction.
+Whatever is still queued when the process exits is written by an atexit handler.
+"""
+
+import atexit
+import os
+import threading
+import time
+
+from db import store_reviews
+
+# Seconds a rating waits in the queue for newer changes to the same game
+REVIEW_FLUSH_DELAY = float(os.getenv("REVIEW_FLUSH_DELAY", 0.5))
+# Seconds before retrying a failed write, doubled after each failure in a row up to the max
+REVIEW_RETRY_DELAY = float(os.getenv("REVIEW_RETRY_DELAY", 1))
+REVIEW_RETRY_MAX_DELAY = float(os.getenv("REVIEW_RETRY_MAX_DELAY", 60))
+
+# Game name -> latest queued rating
+_pending = {}
+# Monotonic time the oldest rating in _pending was queued
+_oldest_queued_at = None
+# Monotonic time before which a failed write isn't retried, and the current backoff
+_retry_at = None
+_retry_delay = 0.0
+_condition = threading.Condition()
+# Held for a whole flush, so batches are written in the order they were taken
+_flush_lock = threading.Lock()
+_writer_thread = None
+
+_stats = {
+    'queued': 0,
+    'coalesced': 0,
+    'written': 0,
+    'flushes': 0,
+    'failed_flushes': 0,
+    'total_flush_seconds': 0.0,
+    'max_flush_seconds': 0.0,
+    'max_wait_seconds': 0.0,
+}
+
+
+def _run():
+    while True:
+        with _condition:
+            while not _pending:
+                _condition.wait()
+            delay = max(_oldest_queued_at + REVIEW_FLUSH_DELAY, _retry_at or 0) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        flush()
+
+def _start_writer():
+    # Called with _condition held
+    global _writer_thread
+    if _writer_thread is None or not _writer_thread.is_alive():
+        _writer_thread = threading.Thread(target=_run, name="review-writer", daemon=True)
+        _writer_thread.start()
+
+def queue_review(name, rating):
+    """
+    Queue a rating to be saved by the background writer.
+
+    Args:
+        name (str): The name of the game.
+        rating (int): The new rating, replacing any rating still queued for the game.
+    """
+    global _oldest_queued_at
+    with _condition:
+        if name in _pending:
+            _stats['coalesced'] += 1
+        elif not _pending:
+            _oldest_queued_at = time.monotonic()
+        _pending[name] = rating
+        _stats['queued'] += 1
+        _start_writer()
+        _condition.notify()
+
+def discard_review(name):
+    """Drop a queued rating, waiting for any write in progress to finish first."""
+    global _oldest_queued_at
+    with _flush_lock, _condition:
+        _pending.pop(name, None)
+        if not _pending:
+            _oldest_queued_at = None
+
+def pending_reviews():
+    """Return a copy of the ratings that are queued but not written yet."""
+    with _condition:
+        return dict(_pending)
+
+def flush():
+    """
+    Write every queued rating now, in one transaction.
+
+    Returns:
+        int: How many ratings were written.
+    """
+    global _oldest_queued_at, _retry_at, _retry_delay
+    with _flush_lock:
+        with _condition:
+            if not _pending:
+                return 0
+            batch = dict(_pending)
+            queued_at = _oldest_queued_at
+            _pending.clear()
+            _oldest_queued_at = None
+
+        start = time.monotonic()
+        try:
+            store_reviews(batch)
+        except Exception as e:
+            print(f"Error saving reviews: {e}")
+            with _condition:
+                _stats['failed_flushes'] += 1
+                # Put the batch back behind anything queued since, to try again later
+                for name, rating in batch.items():
+                    _pending.setdefault(name, rating)
+                _oldest_queued_at = queued_at
+                # Back off, so a lasting error like a locked database or a full disk isn't retried in a loop
+                _retry_delay = min(max(_retry_delay * 2, REVIEW_RETRY_DELAY), REVIEW_RETRY_MAX_DELAY)
+                _retry_at = time.monotonic() + _retry_delay
+                _condition.notify()
+            return 0
+        finished = time.monotonic()
+
+        with _condition:
+            _retry_at = None
+            _retry_delay = 0.0
+            _stats['flushes'] += 1
+            _stats['written'] += len(batch)
+            _stats['total_flush_seconds'] += finished - start
+            _stats['max_flush_seconds'] = max(_stats['max_flush_seconds'], finished - start)
+            _stats['max_wait_seconds'] = max(_stats['max_wait_seconds'], finished - queued_at)
+        return len(batch)
+
+def review_writer_metrics():
+    """
+    Return the queue depth and flush statistics of the writer.
+
+    Returns:
+        dict: The current ``queue_depth`` and age of the oldest queued rating in
+        ``oldest_wait_seconds``, ratings ``queued``, ``coalesced`` into a newer one and
+        ``written``, ``flushes`` and ``failed_flushes``, the ``mean_flush_seconds`` and
+        ``max_flush_seconds`` of a write, and ``max_wait_seconds`` from queueing to written.
+    """
+    with _condition:
+        metrics = dict(_stats)
+        metrics['queue_depth'] = len(_pending)
+        metrics['oldest_wait_seconds'] = (
+            time.monotonic() - _oldest_queued_at if _oldest_queued_at is not None else 0.0
+        )
+    total = metrics.pop('total_flush_seconds')
+    metrics['mean_flush_seconds'] = total / metrics['flushes'] if metrics['flushes'] else 0.0
+    return metrics
+
+# Anything still queued is written before the process exits
+atexit.register(flush)
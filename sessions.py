@@ -0,0 +1,61 @@
+"""
+Persisted logins for Backlogr.
+
+A verified Steam login is stored server-side in the login_sessions table under a
+random token, which the page keeps in its ``session`` query parameter. Reloading
+the page restores the login from that table without calling Steam again.
+
+Since the token sits in the URL, where it ends up in browser history and copied
+links, it is short-lived and single-use: every restore swaps it for a new token,
+valid for another SESSION_TTL. Only a hash of each token is stored, so the table
+can't be used to log in by itself.
+"""
+
+import hashlib
+import os
+import secrets
+import time
+
+from db import delete_login_session, rotate_login_session, store_login_session
+
+# Seconds a session token can be used to restore a login before Steam has to be asked again
+SESSION_TTL = float(os.getenv("BACKLOGR_SESSION_TTL", 8 * 60 * 60))
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_session(steam_id):
+    """
+    Persist a verified login.
+
+    Args:
+        steam_id (str): The Steam account that logged in.
+
+    Returns:
+        str: The session token to hand to the browser.
+    """
+    token = secrets.token_urlsafe(32)
+    store_login_session(_hash_token(token), steam_id, time.time() + SESSION_TTL)
+    return token
+
+def restore_session(token):
+    """
+    Restore a login from its session token, replacing the token with a new one.
+
+    Returns:
+        tuple: (steam_id, new_token), or (None, None) if the token is unknown,
+        already used or expired.
+    """
+    if not token:
+        return None, None
+    new_token = secrets.token_urlsafe(32)
+    steam_id = rotate_login_session(_hash_token(token), _hash_token(new_token), time.time() + SESSION_TTL)
+    if steam_id is None:
+        return None, None
+    return steam_id, new_token
+
+def end_session(token):
+    """Forget a session, so its token no longer logs in."""
+    if token:
+        delete_login_session(_hash_token(token))
@@ -0,0 +1,257 @@
+"""
+Vectorized library statistics for Backlogr.
+
+A library is loaded once, with one query, into a column-oriented DataFrame: one
+row per owned game and one NumPy array per field, with the genre and status held
+as categorical codes. Every statistic below is then a grouped or whole-array
+operation, so new charts stay cheap even for merged multi-account libraries with
+tens of thousands of games.
+
+Playtimes stay in minutes, as Steam reports them.
+
+``library_stats`` keeps the frame of each set of accounts and everything derived
+from it in memory until the database is next written to, so switching between
+Visual Stats views neither reloads nor re-aggregates the library. Only the
+STATS_CACHE_SIZE most recently used sets are kept.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from db import (
+    GAME_STATUSES, LIBRARY_ROW_COLUMNS, PLATFORM_PLAYTIME_COLUMNS, get_library_rows,
+    write_generation,
+)
+from genres import GENRES
+
+# Percentiles included in every group_summary
+SUMMARY_PERCENTILES = (0.25, 0.75, 0.9)
+# Playtime histogram bin edges in minutes, four per decade from one minute to
+# about 16,000 hours; longer playtimes are counted in the last bin
+PLAYTIME_BINS = np.logspace(0, 6, 25)
+# How many sets of accounts keep their snapshot in memory across all sessions
+STATS_CACHE_SIZE = 8
+
+_INTEGER_COLUMNS = ('appid', 'playtime_forever', 'rtime_last_played') + PLATFORM_PLAYTIME_COLUMNS
+
+
+def load_library_frame(steam_ids):
+    """
+    Load one or more libraries into a DataFrame.
+
+    Args:
+        steam_ids (iterable): The Steam accounts to load. Games owned by several
+            accounts get one row per account; see ``merge_accounts``.
+
+    Returns:
+        pandas.DataFrame: One row per game with the columns of LIBRARY_ROW_COLUMNS.
+        ``genre`` and ``status`` are categoricals over GENRES and GAME_STATUSES,
+        ``hundredpercent`` and ``hold`` are booleans and ``rating`` is a float
+        that is NaN for unrated games.
+    """
+    frame = pd.DataFrame.from_records(get_library_rows(steam_ids), columns=list(LIBRARY_ROW_COLUMNS))
+    for column in _INTEGER_COLUMNS:
+        frame[column] = frame[column].astype(np.int64)
+    frame['steam_id'] = frame['steam_id'].astype('category')
+    frame['genre'] = pd.Categorical(frame['genre'], categories=GENRES)
+    frame['status'] = pd.Categorical(frame['status'], categories=GAME_STATUSES)
+    frame['hundredpercent'] = frame['hundredpercent'].astype(bool)
+    frame['hold'] = frame['hold'].astype(bool)
+    frame['rating'] = frame['rating'].astype(np.float64)
+    return frame
+
+def merge_accounts(frame):
+    """
+    Collapse games owned by several accounts into one row per appid.
+
+    Playtimes are summed and the latest ``rtime_last_played`` is kept; every other
+    column comes from the first account that owns the game.
+
+    Returns:
+        pandas.DataFrame: The merged frame, with the same columns except steam_id.
+    """
+    summed = ('playtime_forever',) + PLATFORM_PLAYTIME_COLUMNS
+    aggregations = {column: 'first' for column in frame.columns if column not in ('steam_id', 'appid')}
+    aggregations.update({column: 'sum' for column in summed})
+    aggregations['rtime_last_played'] = 'max'
+    return frame.groupby('appid', sort=False).agg(aggregations).reset_index()
+
+def group_summary(frame, by='genre', column='playtime_forever', percentiles=SUMMARY_PERCENTILES):
+    """
+    Summarize a column per group.
+
+    Args:
+        frame (pandas.DataFrame): A frame from ``load_library_frame``.
+        by (str or list): The column(s) to group by.
+        column (str): The column to summarize.
+        percentiles (tuple): Extra quantiles to include, between 0 and 1.
+
+    Returns:
+        pandas.DataFrame: Indexed by group, with count, sum, mean and median
+        columns and a ``p<N>`` column per percentile. Empty groups are left out.
+    """
+    grouped = frame.groupby(by, observed=True, sort=True)[column]
+    summary = grouped.agg(['count', 'sum', 'mean', 'median'])
+    if percentiles:
+        quantiles = grouped.quantile(list(percentiles)).unstack()
+        quantiles.columns = [f"p{round(q * 100)}" for q in quantiles.columns]
+        summary = summary.join(quantiles)
+    return summary
+
+def group_histogram(frame, bins, by='genre', column='playtime_forever'):
+    """
+    Count the values of a column per group into the same bins.
+
+    Args:
+        frame (pandas.DataFrame): A frame from ``load_library_frame``.
+        bins (array-like): Increasing bin edges. Values outside them aren't counted.
+        by (str): A categorical column to group by.
+        column (str): The column to bin.
+
+    Returns:
+        tuple: (groups, counts) where counts has one row of len(bins) - 1 counts
+        for each group in groups.
+    """
+    edges = np.asarray(bins, dtype=np.float64)
+    values = frame[column].to_numpy(dtype=np.float64)
+    groups = frame[by].cat.categories
+    codes = frame[by].cat.codes.to_numpy()
+    bin_count = len(edges) - 1
+
+    # The last bin includes its right edge, like numpy.histogram
+    positions = np.searchsorted(edges, values, side='right') - 1
+    positions[values == edges[-1]] = bin_count - 1
+    counted = (codes >= 0) & (positions >= 0) & (positions < bin_count)
+    flat = codes[counted].astype(np.int64) * bin_count + positions[counted]
+    counts = np.bincount(flat, minlength=len(groups) * bin_count).reshape(len(groups), bin_count)
+    return list(groups), counts
+
+def top_n(frame, n, column='playtime_forever', by=None):
+    """
+    Return the n rows with the largest values of a column.
+
+    Args:
+        frame (pandas.DataFrame): A frame from ``load_library_frame``.
+        n (int): How many rows to return, per group when ``by`` is given.
+        column (str): The column to rank by.
+        by (str): A column to rank within, or None to rank the whole frame.
+
+    Returns:
+        pandas.DataFrame: The selected rows, largest first (within each group).
+    """
+    values = frame[column].to_numpy()
+    if by is None:
+        if n >= len(frame):
+            order = np.argsort(-values, kind='stable')
+        else:
+            # Only the top n are selected in linear time, then sorted
+            top = np.argpartition(-values, n)[:n]
+            order = top[np.argsort(-values[top], kind='stable')]
+        return frame.iloc[order]
+
+    codes = frame[by].cat.codes.to_numpy() if frame[by].dtype == 'category' else pd.factorize(frame[by])[0]
+    # Sort by group, then by value descending, and keep each group's first n rows
+    order = np.lexsort((-values, codes))
+    sorted_codes = codes[order]
+    group_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    group_lengths = np.diff(np.r_[group_starts, len(order)])
+    rank = np.arange(len(order)) - np.repeat(group_starts, group_lengths)
+    keep = order[(rank < n) & (sorted_codes >= 0)]
+    return frame.iloc[keep]
+
+def playtime_histogram(frame, bins=PLAYTIME_BINS):
+    """
+    Count the games of a frame into log-spaced playtime bins.
+
+    Games that were never played have no place on a log scale, so they are
+    counted separately.
+
+    Returns:
+        tuple: (counts, bins, unplayed) with len(bins) - 1 counts.
+    """
+    playtime = frame['playtime_forever'].to_numpy()
+    played = playtime[playtime > 0]
+    counts, edges = np.histogram(np.minimum(played, bins[-1]), bins=bins)
+    return counts, edges, int(len(playtime) - len(played))
+
+def category_cdfs(frame, bins=PLAYTIME_BINS):
+    """
+    Cumulative playtime distribution of each category.
+
+    Returns:
+        dict: Status -> the fraction of that category's games played less than
+        each edge of ``bins``, for the statuses that have games. The last edge
+        covers every game, and unplayed games count towards every edge.
+    """
+    # A leading zero edge puts unplayed games in a bin of their own
+    edges = np.r_[0, bins]
+    clipped = frame.assign(playtime_forever=np.minimum(frame['playtime_forever'], bins[-1]))
+    statuses, counts = group_histogram(clipped, edges, by='status')
+    totals = counts.sum(axis=1)
+    # Column i counts the games played less than bins[i]
+    cumulative = np.cumsum(counts, axis=1)
+    return {
+        status: cumulative[index] / totals[index]
+        for index, status in enumerate(statuses) if totals[index]
+    }
+
+
+class LibraryStats:
+    """
+    The frame of one or more libraries and the statistics derived from it.
+
+    Every statistic is computed on first use and then kept, so asking again is
+    free for as long as the snapshot is current.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    @cached_property
+    def genre_summary(self):
+        return group_summary(self.frame, by='genre')
+
+    @cached_property
+    def playtime_histogram(self):
+        return playtime_histogram(self.frame)
+
+    @cached_property
+    def category_cdfs(self):
+        return category_cdfs(self.frame)
+
+
+# Sorted steam_ids -> (write generation, LibraryStats), least recently used first
+_stats_cache = OrderedDict()
+_stats_cache_lock = threading.Lock()
+
+def library_stats(steam_ids):
+    """
+    Return the statistics snapshot of one or more libraries.
+
+    The snapshot is loaded with ``load_library_frame`` and reused until this
+    process next writes to the database.
+
+    Returns:
+        LibraryStats: The current snapshot.
+    """
+    key = tuple(sorted(steam_ids))
+    generation = write_generation()
+    with _stats_cache_lock:
+        cached = _stats_cache.get(key)
+        if cached is not None and cached[0] == generation:
+            _stats_cache.move_to_end(key)
+            return cached[1]
+    snapshot = LibraryStats(load_library_frame(key))
+    with _stats_cache_lock:
+        # Snapshots from before the last write will never be served again
+        for stale in [k for k, (g, _) in _stats_cache.items() if g != generation]:
+            del _stats_cache[stale]
+        _stats_cache[key] = (generation, snapshot)
+        _stats_cache.move_to_end(key)
+        while len(_stats_cache) > STATS_CACHE_SIZE:
+            _stats_cache.popitem(last=False)
+    return snapshot
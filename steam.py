@@ -0,0 +1,608 @@
+"""
+Steam Web API and OpenID helpers for Backlogr.
+
+Owned-games responses are cached per Steam account, in memory and in the
+library_games table, so Streamlit reruns and process restarts don't each cost a
+round trip to Steam. Each sync only writes the games that changed since the last
+one. Libraries are fetched on a small per-process thread pool rather than on the
+Streamlit script thread: pages read the latest snapshot without waiting, and
+accounts of active sessions are refreshed once their snapshot is older than
+LIBRARY_CACHE_TTL. Refreshes are single-flight, so every session asking for the
+same account while a fetch is running shares that one fetch.
+
+All calls to Steam share one keep-alive session, use per-endpoint timeouts and
+are retried a bounded number of times with jittered exponential backoff. The
+latency of every attempt is recorded in a per-endpoint histogram.
+
+An OpenID login assertion is checked with Steam at most once. Its nonce is kept
+in a bounded replay cache, so a rerun or replay of the same callback URL is
+rejected without a round trip, as are assertions older than OPENID_NONCE_MAX_AGE.
+
+Each Steam host has a circuit breaker. After BREAKER_FAILURE_THRESHOLD calls in
+a row fail even with retries, calls to that host fail at once instead of
+waiting on timeouts, and pages serve the last synced library marked as offline.
+Once BREAKER_COOLDOWN seconds have passed, a single call is let through as a
+probe; the refresh scheduler uses the cheap GetServerInfo endpoint for it. The
+breaker closes again as soon as a probe succeeds.
+"""
+
+import bisect
+import calendar
+import os
+import re
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential,
+)
+# To hide API key
+from dotenv import load_dotenv
+
+from db import get_cached_library, get_library_sync_times, store_cached_library
+
+load_dotenv()
+
+# Steam OAuth Configuration
+STEAM_OPENID_URL = "https://steamcommunity.com/openid/login"
+REDIRECT_URI = "http://localhost:8501"  # Replace with your Streamlit app's URL
+STEAM_API_KEY = os.getenv("STEAM_API_KEY")
+# Seconds after Steam issued it that an OpenID assertion is still accepted
+OPENID_NONCE_MAX_AGE = float(os.getenv("OPENID_NONCE_MAX_AGE", 5 * 60))
+# Seconds an assertion may seem to come from the future, for clock skew
+OPENID_CLOCK_SKEW = 60
+# How many checked nonces are remembered to reject replayed assertions
+OPENID_NONCE_CACHE_SIZE = int(os.getenv("OPENID_NONCE_CACHE_SIZE", 4096))
+STEAM_CLAIMED_ID = re.compile(r"^https://steamcommunity\.com/openid/id/(\d{17})$")
+
+# (connect, read) timeouts in seconds for each Steam endpoint
+TIMEOUTS = {
+    "openid_verify": (3.05, 10),
+    "owned_games": (3.05, 20),
+    "app_details": (3.05, 10),
+    "server_info": (3.05, 5),
+}
+# Attempts per call, including the first one
+MAX_ATTEMPTS = 3
+# Response codes worth retrying; anything else is returned to the caller as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# Calls in a row that must fail before a host's circuit breaker opens
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("STEAM_BREAKER_FAILURE_THRESHOLD", 3))
+# Seconds an open breaker rejects calls before letting a probe through
+BREAKER_COOLDOWN = float(os.getenv("STEAM_BREAKER_COOLDOWN", 60))
+
+STEAM_API_HOST = "api.steampowered.com"
+
+# Seconds a cached library is served before it is refreshed in the background
+LIBRARY_CACHE_TTL = float(os.getenv("LIBRARY_CACHE_TTL", 15 * 60))
+# Libraries fetched from Steam at once by the refresh pool
+LIBRARY_REFRESH_WORKERS = int(os.getenv("LIBRARY_REFRESH_WORKERS", 4))
+# Seconds between checks for stale libraries of active sessions
+LIBRARY_REFRESH_INTERVAL = float(os.getenv("LIBRARY_REFRESH_INTERVAL", 30))
+# Seconds after its last rerun that an account stops being refreshed on schedule
+LIBRARY_IDLE_TIMEOUT = float(os.getenv("LIBRARY_IDLE_TIMEOUT", 30 * 60))
+# How many libraries are kept decoded in memory across all sessions
+LIBRARY_MEMORY_SIZE = int(os.getenv("LIBRARY_MEMORY_SIZE", 16))
+
+# steam_id -> (games, fetched_at), least recently used first, so reruns skip
+# rebuilding the game list while the stored sync time still matches
+_library_memory = OrderedDict()
+_library_memory_lock = threading.Lock()
+# steam_id -> Future of the refresh in progress
+_in_flight = {}
+# steam_ids whose last refresh could not reach Steam
+_failed_refreshes = set()
+# steam_id -> monotonic time of the last rerun that showed the account
+_watched = {}
+_refresh_lock = threading.Lock()
+_refresh_executor = None
+_scheduler_thread = None
+_refresh_stats = {'requested': 0, 'deduplicated': 0, 'completed': 0, 'failed': 0, 'scheduled': 0}
+
+
+class LatencyHistogram:
+    """Counts request latencies into the buckets of LATENCY_BUCKETS."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total_seconds = 0.0
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.total_seconds += seconds
+
+    def snapshot(self):
+        """Return the request count, mean latency and count per bucket upper bound."""
+        with self._lock:
+            count = sum(self.counts)
+            return {
+                "count": count,
+                "mean_seconds": self.total_seconds / count if count else 0.0,
+                "buckets": dict(zip(LATENCY_BUCKETS, self.counts)),
+            }
+
+
+class RetryableStatus(requests.HTTPError):
+    """Raised for responses whose status code is in RETRY_STATUSES."""
+
+
+class SteamUnavailable(requests.RequestException):
+    """Raised instead of calling a Steam host whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a Steam host after repeated failures until a probe succeeds.
+
+    The breaker is closed while calls succeed. BREAKER_FAILURE_THRESHOLD failures
+    in a row open it, and it rejects calls for BREAKER_COOLDOWN seconds. After
+    that it is half-open: one call is let through as a probe, which closes the
+    breaker if it succeeds and opens it for another cooldown if it fails.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self):
+        """Return whether a call may be sent, claiming the probe when one is due."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if not self._probing and time.monotonic() - self.opened_at >= BREAKER_COOLDOWN:
+                self.state = "half_open"
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def probe_due(self):
+        """Return whether the breaker is open and its cooldown has passed."""
+        with self._lock:
+            return (
+                self.state != "closed" and not self._probing
+                and time.monotonic() - self.opened_at >= BREAKER_COOLDOWN
+            )
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= BREAKER_FAILURE_THRESHOLD:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """Give back a claimed probe without judging the host, after an unrelated error."""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self):
+        """Return the state, consecutive failures and calls rejected so far."""
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+
+_session = None
+_session_lock = threading.Lock()
+_latency = {endpoint: LatencyHistogram() for endpoint in TIMEOUTS}
+# Nonce -> when Steam issued it, for every assertion checked in this process
+_checked_nonces = OrderedDict()
+_nonce_lock = threading.Lock()
+# Steam host -> CircuitBreaker
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_session():
+    """Return the process-wide keep-alive session used for every Steam call."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Steam calls go to two hosts, each from a few script threads at once
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def latency_histograms():
+    """Return a latency histogram snapshot for each Steam endpoint."""
+    return {endpoint: histogram.snapshot() for endpoint, histogram in _latency.items()}
+
+def _breaker(host):
+    # The circuit breaker of a host, created on its first call
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker()
+        return breaker
+
+def breaker_states():
+    """Return a circuit breaker snapshot for each Steam host called so far."""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {host: breaker.snapshot() for host, breaker in breakers.items()}
+
+def steam_offline(host=STEAM_API_HOST):
+    """Return whether calls to a Steam host are being cut off by its circuit breaker."""
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+    return breaker is not None and breaker.snapshot()["state"] != "closed"
+
+def _send(endpoint, method, url, **kwargs):
+    # One attempt, timed into the endpoint's histogram
+    start = time.perf_counter()
+    try:
+        response = get_session().request(method, url, timeout=TIMEOUTS[endpoint], **kwargs)
+    finally:
+        _latency[endpoint].observe(time.perf_counter() - start)
+    if response.status_code in RETRY_STATUSES:
+        raise RetryableStatus(f"{endpoint} returned {response.status_code}", response=response)
+    return response
+
+_send_with_retries = retry(
+    retry=retry_if_exception_type((requests.ConnectionError, requests.Timeout, RetryableStatus)),
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    wait=wait_random_exponential(multiplier=0.5, max=4),
+    reraise=True,
+)(_send)
+
+def call_steam(endpoint, method, url, retries=True, **kwargs):
+    """
+    Send one request to a Steam endpoint, retrying transient failures.
+
+    Calls to a host whose circuit breaker is open fail straight away with
+    SteamUnavailable. Only unreachable hosts and the statuses of RETRY_STATUSES
+    count as failures for the breaker; other error statuses are answers.
+
+    Args:
+        endpoint (str): A key of TIMEOUTS, used for the timeout and latency histogram.
+        method (str): The HTTP method.
+        url (str): The URL to call.
+        retries (bool): Whether transient failures are retried, up to MAX_ATTEMPTS.
+        **kwargs: Passed on to ``requests.Session.request``.
+
+    Returns:
+        requests.Response: The response of the last attempt.
+
+    Raises:
+        SteamUnavailable: If the host's circuit breaker is open.
+    """
+    breaker = _breaker(urllib.parse.urlsplit(url).netloc)
+    if not breaker.allow():
+        raise SteamUnavailable(f"{endpoint}: Steam is unreachable, not calling it until the next probe")
+    try:
+        response = (_send_with_retries if retries else _send)(endpoint, method, url, **kwargs)
+    except (requests.ConnectionError, requests.Timeout, RetryableStatus):
+        breaker.record_failure()
+        raise
+    except requests.RequestException:
+        # The host answered, just not usefully
+        breaker.record_success()
+        raise
+    except Exception:
+        breaker.release()
+        raise
+    breaker.record_success()
+    return response
+
+# Construct the OpenID request URL
+def authenticate_with_steam():
+    params = {
+        "openid.ns": "http://specs.openid.net/auth/2.0",
+        "openid.mode": "checkid_setup",
+        "openid.return_to": REDIRECT_URI,
+        "openid.realm": REDIRECT_URI,
+        "openid.identity": "http://specs.openid.net/auth/2.0/identifier_select",
+        "openid.claimed_id": "http://specs.openid.net/auth/2.0/identifier_select",
+    }
+    auth_url = f"{STEAM_OPENID_URL}?" + urllib.parse.urlencode(params)
+    return auth_url
+
+def _claim_nonce(nonce):
+    # Remember an assertion's nonce, returning False if it is malformed, stale or already used
+    try:
+        # Steam nonces start with the UTC time they were issued, e.g. 2024-05-01T12:34:56Z
+        issued_at = calendar.timegm(time.strptime(nonce[:20], "%Y-%m-%dT%H:%M:%SZ"))
+    except (TypeError, ValueError):
+        return False
+    now = time.time()
+    if not -OPENID_CLOCK_SKEW <= now - issued_at <= OPENID_NONCE_MAX_AGE:
+        return False
+    with _nonce_lock:
+        # Stale nonces are rejected by age anyway, so only the recent ones need remembering
+        while _checked_nonces and (
+            len(_checked_nonces) >= OPENID_NONCE_CACHE_SIZE
+            or now - next(iter(_checked_nonces.values())) > OPENID_NONCE_MAX_AGE
+        ):
+            _checked_nonces.popitem(last=False)
+        if nonce in _checked_nonces:
+            return False
+        _checked_nonces[nonce] = issued_at
+    return True
+
+def _returns_here(return_to):
+    # Whether an assertion was issued for this app, not another site using Steam login
+    url, expected = urllib.parse.urlsplit(return_to), urllib.parse.urlsplit(REDIRECT_URI)
+    return (
+        url.scheme == expected.scheme
+        and url.netloc == expected.netloc
+        and (url.path.rstrip("/") + "/").startswith(expected.path.rstrip("/") + "/")
+    )
+
+# Validate Steam OpenID login
+def verify_steam_login(query_params):
+    """
+    Verify a Steam OpenID login assertion, checking it with Steam at most once.
+
+    Assertions that aren't for a Steam account, were issued for another site
+    than REDIRECT_URI, are older than OPENID_NONCE_MAX_AGE or whose nonce was
+    already checked are rejected without calling Steam.
+
+    Args:
+        query_params (Mapping): The ``openid.*`` parameters of the callback URL.
+
+    Returns:
+        str: The Steam ID that logged in, or None if the login could not be verified.
+    """
+    # Repeated parameters arrive as lists; only the first value counts
+    params = {
+        key: value[0] if isinstance(value, list) else value
+        for key, value in dict(query_params).items() if key.startswith("openid.")
+    }
+    claimed = STEAM_CLAIMED_ID.match(params.get("openid.claimed_id", ""))
+    if (
+        claimed is None
+        or params.get("openid.mode") != "id_res"
+        or params.get("openid.op_endpoint") != STEAM_OPENID_URL
+        or not _returns_here(params.get("openid.return_to", ""))
+        or not _claim_nonce(params.get("openid.response_nonce"))
+    ):
+        return None
+
+    params["openid.mode"] = "check_authentication"
+    try:
+        response = call_steam("openid_verify", "POST", STEAM_OPENID_URL, data=params)
+    except requests.RequestException as e:
+        print(f"Error verifying login: {e}")
+        return None
+
+    # The response is key:value lines
+    if "is_valid:true" in response.text.splitlines():
+        return claimed.group(1)
+    return None
+
+def request_owned_games(steam_id):
+    """
+    Fetch basic game information without genres straight from Steam.
+
+    Returns:
+        list: The owned games, or None if Steam could not be reached.
+    """
+    url = "http://api.steampowered.com/IPlayerService/GetOwnedGames/v1/"
+    params = {
+        "key": STEAM_API_KEY,
+        "steamid": steam_id,
+        "include_appinfo": True,
+        "include_played_free_games": True
+    }
+    try:
+        response = call_steam("owned_games", "GET", url, params=params)
+        if response.ok:
+            return response.json().get("response", {}).get("games", [])
+        return None
+    except Exception as e:
+        print(f"Error fetching library: {e}")
+        return None
+
+def probe_steam():
+    """
+    Check with one cheap call whether the Steam Web API answers again.
+
+    Closes the API's circuit breaker if it does, so library syncs resume.
+
+    Returns:
+        bool: Whether Steam answered.
+    """
+    url = f"http://{STEAM_API_HOST}/ISteamWebAPIUtil/GetServerInfo/v1/"
+    try:
+        return call_steam("server_info", "GET", url, retries=False).ok
+    except requests.RequestException as e:
+        print(f"Steam is still unreachable: {e}")
+        return False
+
+def sync_library(steam_id):
+    """
+    Fetch a library from Steam and store what changed since the last sync.
+
+    Returns:
+        tuple: (games, diff) with the owned games and the changes as returned by
+        ``store_cached_library``, or (None, None) if Steam could not be reached.
+    """
+    games = request_owned_games(steam_id)
+    if games is None:
+        return None, None
+    fetched_at = time.time()
+    diff = store_cached_library(steam_id, games, fetched_at)
+    _remember_library(steam_id, games, fetched_at)
+    return games, diff
+
+def _run_refresh(steam_id):
+    # Runs on the refresh pool; the in-flight entry is cleared however it ends
+    try:
+        games = sync_library(steam_id)[0]
+    except Exception as e:
+        print(f"Error refreshing library: {e}")
+        games = None
+    with _refresh_lock:
+        _in_flight.pop(steam_id, None)
+        if games is None:
+            _failed_refreshes.add(steam_id)
+            _refresh_stats['failed'] += 1
+        else:
+            _failed_refreshes.discard(steam_id)
+            _refresh_stats['completed'] += 1
+    return games
+
+def request_refresh(steam_id):
+    """
+    Refresh a library on the background pool, unless a refresh is already running.
+
+    Args:
+        steam_id (str): The Steam account to refresh.
+
+    Returns:
+        concurrent.futures.Future: The refresh in progress for the account,
+        resolving to the owned games or None if Steam could not be reached.
+    """
+    global _refresh_executor
+    with _refresh_lock:
+        future = _in_flight.get(steam_id)
+        _refresh_stats['requested'] += 1
+        if future is not None:
+            _refresh_stats['deduplicated'] += 1
+            return future
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=LIBRARY_REFRESH_WORKERS, thread_name_prefix="library-refresh"
+            )
+        future = _refresh_executor.submit(_run_refresh, steam_id)
+        _in_flight[steam_id] = future
+        return future
+
+def _remember_library(steam_id, games, fetched_at):
+    # Keep a library in memory, evicting the least recently used beyond LIBRARY_MEMORY_SIZE
+    with _library_memory_lock:
+        _library_memory[steam_id] = (games, fetched_at)
+        _library_memory.move_to_end(steam_id)
+        while len(_library_memory) > LIBRARY_MEMORY_SIZE:
+            _library_memory.popitem(last=False)
+
+def _forget_library(steam_id):
+    with _library_memory_lock:
+        _library_memory.pop(steam_id, None)
+
+def library_snapshot(steam_id):
+    """
+    Return the latest stored library of an account without waiting for Steam.
+
+    The copy in memory is only used while its sync time matches the database, so
+    syncs written by other processes, such as ``cli.py sync``, are picked up.
+
+    Returns:
+        tuple: (games, fetched_at), or None if the account was never synced.
+    """
+    fetched_at = get_library_sync_times([steam_id]).get(steam_id)
+    if fetched_at is None:
+        _forget_library(steam_id)
+        return None
+    with _library_memory_lock:
+        cached = _library_memory.get(steam_id)
+        if cached is not None and cached[1] == fetched_at:
+            _library_memory.move_to_end(steam_id)
+            return cached
+    cached = get_cached_library(steam_id)
+    if cached is not None:
+        _remember_library(steam_id, *cached)
+    return cached
+
+def refresh_status(steam_id):
+    """
+    Return whether a refresh of an account is running and whether the last one failed.
+
+    Returns:
+        dict: ``refreshing`` and ``failed`` flags.
+    """
+    with _refresh_lock:
+        return {"refreshing": steam_id in _in_flight, "failed": steam_id in _failed_refreshes}
+
+def refresh_metrics():
+    """Return counters of the background library refreshes."""
+    with _refresh_lock:
+        return {**_refresh_stats, 'in_flight': len(_in_flight), 'watched': len(_watched)}
+
+def _refresh_stale_libraries():
+    # Refresh the watched accounts whose snapshot is out of date or whose last refresh failed
+    if steam_offline():
+        # Syncs would be rejected anyway, so only probe once the cooldown has passed
+        if not _breaker(STEAM_API_HOST).probe_due() or not probe_steam():
+            return
+    now = time.monotonic()
+    with _refresh_lock:
+        idle = [steam_id for steam_id, seen_at in _watched.items() if now - seen_at > LIBRARY_IDLE_TIMEOUT]
+        for steam_id in idle:
+            del _watched[steam_id]
+        watched = list(_watched)
+        failed = set(_failed_refreshes)
+    for steam_id in idle:
+        _forget_library(steam_id)
+    sync_times = get_library_sync_times(watched)
+    for steam_id in watched:
+        fetched_at = sync_times.get(steam_id)
+        if fetched_at is None or time.time() - fetched_at > LIBRARY_CACHE_TTL or steam_id in failed:
+            with _refresh_lock:
+                _refresh_stats['scheduled'] += 1
+            request_refresh(steam_id)
+
+def _run_scheduler():
+    while True:
+        time.sleep(LIBRARY_REFRESH_INTERVAL)
+        try:
+            _refresh_stale_libraries()
+        except Exception as e:
+            print(f"Error scheduling library refreshes: {e}")
+
+def watch_library(steam_id):
+    """
+    Keep an account's library refreshed while a session is showing it.
+
+    Called on every rerun of a logged-in session. The account is refreshed on
+    schedule until no session has shown it for LIBRARY_IDLE_TIMEOUT seconds, and
+    right away if it has no snapshot yet or its snapshot is stale.
+
+    Args:
+        steam_id (str): The Steam account of the session.
+    """
+    global _scheduler_thread
+    with _refresh_lock:
+        _watched[steam_id] = time.monotonic()
+        if _scheduler_thread is None or not _scheduler_thread.is_alive():
+            _scheduler_thread = threading.Thread(
+                target=_run_scheduler, name="library-refresh-scheduler", daemon=True
+            )
+            _scheduler_thread.start()
+        if steam_id in _in_flight or steam_id in _failed_refreshes:
+            # Failed accounts wait for the scheduler instead of retrying every rerun
+            return
+    fetched_at = get_library_sync_times([steam_id]).get(steam_id)
+    if fetched_at is None or time.time() - fetched_at > LIBRARY_CACHE_TTL:
+        request_refresh(steam_id)
+
+def unwatch_library(steam_id):
+    """Stop refreshing an account on schedule and drop its library from memory, e.g. on logout."""
+    with _refresh_lock:
+        _watched.pop(steam_id, None)
+    _forget_library(steam_id)
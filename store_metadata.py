@@ -0,0 +1,206 @@
+"""
+Steam storefront metadata for Backlogr.
+
+Fetches the real genres and categories of each app from the storefront
+``appdetails`` endpoint. Requests run on a small thread pool and share a token
+bucket, because the storefront only allows a couple of hundred calls every few
+minutes. Results are stored in the app_metadata table, including apps the store
+no longer lists, so every appid is fetched at most once. Apps whose request
+failed are left out and fetched again next time. Results that could not be
+written are kept in memory and written at the start of the next fetch. If
+writes keep failing, the fetch stops sending requests whose results would be lost.
+
+The storefront URL can be pointed at a local stand-in server through the
+STEAM_STORE_API_URL environment variable or the ``base_url`` arguments.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from db import get_appids_with_metadata, store_app_metadata
+from steam import call_steam
+
+STORE_API_URL = os.getenv("STEAM_STORE_API_URL", "https://store.steampowered.com/api")
+# Requests in flight at once
+STORE_MAX_WORKERS = int(os.getenv("STEAM_STORE_MAX_WORKERS", 4))
+# Sustained requests per second, and how many may be sent in a burst
+STORE_RATE_LIMIT = float(os.getenv("STEAM_STORE_RATE_LIMIT", 200 / 300))
+STORE_BURST = int(os.getenv("STEAM_STORE_BURST", 10))
+# How many fetched apps are written to the database per transaction
+STORE_WRITE_BATCH = 25
+# Failed writes in a row after which a fetch cancels its remaining requests
+STORE_WRITE_ATTEMPTS = 3
+
+_background_thread = None
+_background_lock = threading.Lock()
+# appid -> fetched details whose write failed, written before anything is fetched again
+_unwritten = {}
+_unwritten_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket rate limiter.
+
+    Tokens are added at ``rate`` per second up to ``capacity``; each call to
+    ``acquire`` takes one, sleeping until one is available.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Shared by every fetch in the process, since the storefront limit is per client
+_bucket = TokenBucket(STORE_RATE_LIMIT, STORE_BURST)
+
+def fetch_app_details(appid, base_url=None, bucket=None):
+    """
+    Fetch the genres and categories of one app from the storefront.
+
+    Args:
+        appid (int): The Steam appid.
+        base_url (str): The storefront API URL, defaults to STORE_API_URL.
+        bucket (TokenBucket): The rate limiter to use, defaults to the shared one.
+
+    Returns:
+        dict: {"genres": [...], "categories": [...]} with their descriptions, empty
+        for apps the store doesn't list, or None if the store could not be reached.
+    """
+    (bucket or _bucket).acquire()
+    url = f"{base_url or STORE_API_URL}/appdetails"
+    params = {"appids": appid, "filters": "genres,categories", "l": "english"}
+    try:
+        response = call_steam("app_details", "GET", url, params=params)
+        if not response.ok:
+            return None
+        entry = (response.json() or {}).get(str(appid)) or {}
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error fetching app details for {appid}: {e}")
+        return None
+
+    data = entry.get("data") if entry.get("success") else None
+    # The storefront returns an empty list instead of an object when filters match nothing
+    if not isinstance(data, dict):
+        data = {}
+    return {
+        "genres": [genre["description"] for genre in data.get("genres", [])],
+        "categories": [category["description"] for category in data.get("categories", [])],
+    }
+
+def _write_metadata(pending):
+    # Store fetched details, returning False if the database can't take them now
+    try:
+        store_app_metadata(pending)
+    except Exception as e:
+        print(f"Error storing app metadata: {e}")
+        return False
+    return True
+
+def fetch_missing_metadata(appids, base_url=None, max_workers=None, bucket=None):
+    """
+    Fetch and store metadata for the given apps that don't have any yet.
+
+    Args:
+        appids (iterable): The appids that need metadata.
+        base_url (str): The storefront API URL, defaults to STORE_API_URL.
+        max_workers (int): Requests in flight at once, defaults to STORE_MAX_WORKERS.
+        bucket (TokenBucket): The rate limiter to use, defaults to the shared one.
+
+    Returns:
+        int: How many apps were fetched and stored.
+    """
+    with _unwritten_lock:
+        pending = dict(_unwritten)
+        _unwritten.clear()
+    missing = set(appids) - get_appids_with_metadata() - pending.keys()
+
+    stored = 0
+    failed_writes = 0
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers or STORE_MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(fetch_app_details, appid, base_url, bucket): appid
+                for appid in missing
+            }
+            collected = set()
+
+            def collect(future):
+                collected.add(future)
+                try:
+                    details = future.result()
+                except Exception as e:
+                    print(f"Error fetching app details for {futures[future]}: {e}")
+                    return
+                # Failed requests are left out so they are tried again next time
+                if details is not None:
+                    pending[futures[future]] = details
+
+            for future in as_completed(futures):
+                collect(future)
+                if len(pending) < STORE_WRITE_BATCH:
+                    continue
+                if _write_metadata(pending):
+                    stored += len(pending)
+                    pending = {}
+                    failed_writes = 0
+                    continue
+                failed_writes += 1
+                if failed_writes >= STORE_WRITE_ATTEMPTS:
+                    # Stop spending rate-limited requests on results that can't be stored
+                    cancelled = sum(pending_future.cancel() for pending_future in futures)
+                    print(f"Cancelled {cancelled} app detail requests after {failed_writes} failed writes")
+                    break
+        # Requests that were already running when the rest were cancelled
+        for future in futures:
+            if future not in collected and not future.cancelled():
+                collect(future)
+    if pending:
+        if _write_metadata(pending):
+            stored += len(pending)
+        else:
+            with _unwritten_lock:
+                _unwritten.update(pending)
+    return stored
+
+def fetch_missing_metadata_in_background(appids):
+    """
+    Run ``fetch_missing_metadata`` on a background thread.
+
+    Only one background fetch runs at a time; calls made while one is running
+    are ignored, since the next call after it finishes picks up what is left.
+
+    Returns:
+        bool: Whether a new background fetch was started.
+    """
+    global _background_thread
+    with _background_lock:
+        if _background_thread is not None and _background_thread.is_alive():
+            return False
+        _background_thread = threading.Thread(
+            target=fetch_missing_metadata,
+            args=(list(appids),),
+            name="store-metadata-fetch",
+            daemon=True,
+        )
+        _background_thread.start()
+        return True
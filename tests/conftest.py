@@ -0,0 +1,18 @@
+"""Shared fixtures for Backlogr's tests."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import db
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh database in a temporary directory, used through the regular pool."""
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(db, "_pool", None)
+    db.initializeDB()
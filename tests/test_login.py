@@ -0,0 +1,123 @@
+"""Tests for Steam OpenID verification and persisted login sessions."""
+
+import time
+
+import pytest
+
+import sessions
+import steam
+
+STEAM_ID = "76561197960287930"
+
+
+class FakeResponse:
+    status_code = 200
+    ok = True
+    text = "ns:http://specs.openid.net/auth/2.0\nis_valid:true\n"
+
+
+class FakeSession:
+    """Stands in for the requests session, recording every call to Steam."""
+
+    def __init__(self):
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs.get("data")))
+        return FakeResponse()
+
+
+@pytest.fixture
+def fake_steam(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(steam, "get_session", lambda: session)
+    monkeypatch.setattr(steam, "_checked_nonces", type(steam._checked_nonces)())
+    monkeypatch.setattr(steam, "_breakers", {})
+    return session
+
+
+def nonce(age=0, suffix="abc123"):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - age)) + suffix
+
+
+def assertion(**overrides):
+    params = {
+        "openid.ns": "http://specs.openid.net/auth/2.0",
+        "openid.mode": "id_res",
+        "openid.op_endpoint": steam.STEAM_OPENID_URL,
+        "openid.claimed_id": f"https://steamcommunity.com/openid/id/{STEAM_ID}",
+        "openid.identity": f"https://steamcommunity.com/openid/id/{STEAM_ID}",
+        "openid.return_to": steam.REDIRECT_URI,
+        "openid.response_nonce": nonce(),
+        "openid.assoc_handle": "1234567890",
+        "openid.signed": "signed,op_endpoint,claimed_id,identity,return_to,response_nonce,assoc_handle",
+        "openid.sig": "c2lnbmF0dXJl",
+    }
+    params.update(overrides)
+    return params
+
+
+def test_valid_assertion_is_checked_with_steam_once(fake_steam):
+    assert steam.verify_steam_login(assertion()) == STEAM_ID
+    assert len(fake_steam.calls) == 1
+    method, url, data = fake_steam.calls[0]
+    assert (method, url) == ("POST", steam.STEAM_OPENID_URL)
+    assert data["openid.mode"] == "check_authentication"
+
+
+def test_replayed_assertion_is_rejected_without_calling_steam(fake_steam):
+    params = assertion()
+    assert steam.verify_steam_login(params) == STEAM_ID
+    assert steam.verify_steam_login(params) is None
+    assert len(fake_steam.calls) == 1
+
+
+def test_stale_nonce_is_rejected_without_calling_steam(fake_steam):
+    params = assertion(**{"openid.response_nonce": nonce(age=steam.OPENID_NONCE_MAX_AGE + 60)})
+    assert steam.verify_steam_login(params) is None
+    assert fake_steam.calls == []
+
+
+@pytest.mark.parametrize("overrides", [
+    {"openid.op_endpoint": "https://evil.example/openid/login"},
+    {"openid.return_to": "https://other-site.example/auth"},
+    {"openid.return_to": steam.REDIRECT_URI + ".evil.example/"},
+    {"openid.claimed_id": f"https://evil.example/openid/id/{STEAM_ID}"},
+    {"openid.mode": "cancel"},
+    {"openid.response_nonce": "not-a-nonce"},
+])
+def test_foreign_or_malformed_assertion_is_rejected_without_calling_steam(fake_steam, overrides):
+    assert steam.verify_steam_login(assertion(**overrides)) is None
+    assert fake_steam.calls == []
+
+
+def test_steam_saying_invalid_is_rejected(fake_steam, monkeypatch):
+    monkeypatch.setattr(FakeResponse, "text", "ns:http://specs.openid.net/auth/2.0\nis_valid:false\n")
+    assert steam.verify_steam_login(assertion()) is None
+
+
+def test_restored_session_rotates_its_token(database):
+    token = sessions.create_session(STEAM_ID)
+    steam_id, new_token = sessions.restore_session(token)
+    assert steam_id == STEAM_ID
+    assert new_token != token
+    # The old token is spent, the new one works once
+    assert sessions.restore_session(token) == (None, None)
+    assert sessions.restore_session(new_token)[0] == STEAM_ID
+
+
+def test_expired_session_is_not_restored(database, monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_TTL", -1)
+    token = sessions.create_session(STEAM_ID)
+    assert sessions.restore_session(token) == (None, None)
+
+
+def test_ended_session_is_not_restored(database):
+    token = sessions.create_session(STEAM_ID)
+    sessions.end_session(token)
+    assert sessions.restore_session(token) == (None, None)
+
+
+def test_unknown_session_is_not_restored(database):
+    assert sessions.restore_session("made-up-token") == (None, None)
+    assert sessions.restore_session(None) == (None, None)
@@ -0,0 +1,123 @@
+"""Tests for fetching storefront metadata against a local stand-in server."""
+
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import db
+import steam
+import store_metadata
+
+LISTED = 10
+# The storefront answers both ways for apps it doesn't list
+UNLISTED = 20
+EMPTY_DATA = 30
+FAILING = 40
+
+
+class StandInStorefront(BaseHTTPRequestHandler):
+    """Answers /appdetails like the storefront, from the server's ``apps`` table."""
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        appid = int(urllib.parse.parse_qs(url.query)["appids"][0])
+        self.server.requests.append(appid)
+        status, body = self.server.apps.get(appid, (200, {str(appid): {"success": False}}))
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def storefront(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInStorefront)
+    server.requests = []
+    server.apps = {
+        LISTED: (200, {str(LISTED): {"success": True, "data": {
+            "genres": [{"id": "1", "description": "Action"}],
+            "categories": [{"id": "2", "description": "Single-player"}],
+        }}}),
+        UNLISTED: (200, {str(UNLISTED): {"success": False}}),
+        EMPTY_DATA: (200, {str(EMPTY_DATA): {"success": True, "data": []}}),
+        FAILING: (404, {}),
+    }
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(steam, "_breakers", {})
+    monkeypatch.setattr(store_metadata, "_unwritten", {})
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(storefront, appids, **kwargs):
+    return store_metadata.fetch_missing_metadata(
+        appids, base_url=storefront.base_url, bucket=store_metadata.TokenBucket(1000, 1000), **kwargs
+    )
+
+
+def stored_metadata():
+    with db.get_pool().connection() as connection:
+        rows = connection.execute("SELECT appid, genres, categories FROM app_metadata;").fetchall()
+    return {appid: (json.loads(genres), json.loads(categories)) for appid, genres, categories in rows}
+
+
+def test_listed_and_unlisted_apps_are_stored_once(database, storefront):
+    assert fetch(storefront, [LISTED, UNLISTED, EMPTY_DATA]) == 3
+    assert stored_metadata() == {
+        LISTED: (["Action"], ["Single-player"]),
+        UNLISTED: ([], []),
+        EMPTY_DATA: ([], []),
+    }
+    # Every app has metadata now, so nothing is requested again
+    assert fetch(storefront, [LISTED, UNLISTED, EMPTY_DATA]) == 0
+    assert sorted(storefront.requests) == [LISTED, UNLISTED, EMPTY_DATA]
+
+
+def test_failed_request_is_not_stored_and_is_retried(database, storefront):
+    assert fetch(storefront, [LISTED, FAILING]) == 1
+    assert FAILING not in stored_metadata()
+
+    storefront.apps[FAILING] = (200, {str(FAILING): {"success": False}})
+    assert fetch(storefront, [LISTED, FAILING]) == 1
+    assert FAILING in stored_metadata()
+    assert storefront.requests.count(FAILING) == 2
+    assert storefront.requests.count(LISTED) == 1
+
+
+def test_failed_write_is_kept_and_written_next_run(database, storefront, monkeypatch):
+    def locked(metadata):
+        raise db.sqlite3.OperationalError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(store_metadata, "store_app_metadata", locked)
+        assert fetch(storefront, [LISTED, UNLISTED]) == 0
+    assert stored_metadata() == {}
+
+    # The kept results are written without asking the storefront again
+    assert fetch(storefront, [LISTED, UNLISTED]) == 2
+    assert set(stored_metadata()) == {LISTED, UNLISTED}
+    assert sorted(storefront.requests) == [LISTED, UNLISTED]
+
+
+def test_repeated_write_failures_cancel_remaining_requests(database, storefront, monkeypatch):
+    def locked(metadata):
+        raise db.sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store_metadata, "store_app_metadata", locked)
+    monkeypatch.setattr(store_metadata, "STORE_WRITE_BATCH", 1)
+    appids = range(1000, 1200)
+    assert fetch(storefront, appids, max_workers=1) == 0
+    assert len(storefront.requests) < 10
+    # Nothing fetched is lost
+    assert set(store_metadata._unwritten) == set(storefront.requests)